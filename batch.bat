@@ -10,11 +10,9 @@ if "%pybin%" == "" (
 rem Forcely change to folder batch script in
 cd %~dp0
 
-:Loop
-IF "%1"=="" GOTO EOF
-    %pybin% cli.py -f %1 -a dump
-SHIFT
-GOTO Loop
+rem One process for all the dropped files, see worker.py for a resident process
+IF "%~1"=="" GOTO EOF
+%pybin% cli.py -a dump %*
 
 :EOF
 pause
\ No newline at end of file
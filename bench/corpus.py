@@ -0,0 +1,127 @@
+"""
+Synthetic .mot corpus generator for the benchmarks.
+
+Every file holds records cycling through interpolation types 0 to 8, tracks
+are random but valid for their encoding (PgHalf-representable headers, code
+ranges of the key formats) and files are written with MotFile.writeToFile.
+"""
+import argparse
+import pathlib
+import random
+import struct
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from package import mot
+from package.ioUtils import decode_PgHalf, encode_PgHalf
+from package.motUtils import Spline
+
+INTERPOLATION_TYPES = tuple(range(9))
+
+
+def _f32(value: float) -> float:
+    return struct.unpack("<f", struct.pack("<f", value))[0]
+
+
+def _pghalf(value: float) -> float:
+    return decode_PgHalf(encode_PgHalf(value))
+
+
+def _frames(rng: random.Random, count: int, frame_count: int) -> list[int]:
+    # strictly increasing key frames within [0, frame_count]
+    if count > frame_count + 1:
+        return list(range(count))
+    return sorted(rng.sample(range(frame_count + 1), count))
+
+
+def generate_record(rng: random.Random, interpolation_type: int, keys: int, frame_count: int) -> mot.MotRecord:
+    record = mot.MotRecord()
+    record.boneIndex = rng.randrange(0, 64)
+    record.propertyIndex = rng.randrange(0, 9)
+    record.interpolationType = interpolation_type
+    record.unknown = 0
+    record.interpolationsCount = 0 if interpolation_type == 0 else keys
+    record.interpolationsOffset = 0
+
+    interpolation = mot.MotInterpolation.classForType(interpolation_type)()
+    interpolation.record = record
+    if interpolation_type == 0:
+        record.value = _f32(rng.uniform(-1.0, 1.0))
+        interpolation.value = record.value
+    elif interpolation_type == 1:
+        interpolation.values = [_f32(rng.uniform(-1.0, 1.0)) for _ in range(keys)]
+    elif interpolation_type in (2, 3):
+        scale = _pghalf if interpolation_type == 3 else _f32
+        code_max = 0xffff if interpolation_type == 2 else 0xff
+        interpolation.p = scale(rng.uniform(-1.0, 0.0))
+        interpolation.dp = scale(rng.uniform(0.001, 0.01))
+        interpolation.dequantizeValues([rng.randrange(code_max + 1) for _ in range(keys)])
+    elif interpolation_type == 4:
+        interpolation.splines = [
+            Spline(frame, _f32(rng.uniform(-1.0, 1.0)), _f32(rng.uniform(-1.0, 1.0)), _f32(rng.uniform(-1.0, 1.0)))
+            for frame in _frames(rng, keys, frame_count)
+        ]
+    else:
+        scale = _f32 if interpolation_type == 5 else _pghalf
+        code_max = 0xffff if interpolation_type == 5 else 0xff
+        for name in ("p", "m0", "m1"):
+            setattr(interpolation, name, scale(rng.uniform(-1.0, 0.0)))
+        for name in ("dp", "dm0", "dm1"):
+            setattr(interpolation, name, scale(rng.uniform(0.001, 0.01)))
+
+        if interpolation_type == 6:
+            frames = _frames(rng, keys, min(frame_count, 0xff))
+        elif interpolation_type == 7:
+            # relative frames, deltas to the previous key
+            frames = [0] + [rng.randrange(1, 4) for _ in range(keys - 1)]
+        else:
+            frames = _frames(rng, keys, frame_count)
+        interpolation.quantizedSplines = [
+            Spline(frame, rng.randrange(code_max + 1), rng.randrange(code_max + 1), rng.randrange(code_max + 1))
+            for frame in frames
+        ]
+        interpolation.dequantize()
+
+    record.interpolation = interpolation
+    return record
+
+
+def generate_mot(rng: random.Random, records: int, keys: int, frame_count: int, name: str = "bench") -> mot.MotFile:
+    mobj = mot.MotFile()
+    mobj.header = mot.MotHeader()
+    mobj.header.fillDefaults()
+    mobj.header.frameCount = frame_count
+    mobj.header.animationName = name
+    mobj.records = [
+        generate_record(rng, INTERPOLATION_TYPES[i % len(INTERPOLATION_TYPES)], keys, frame_count)
+        for i in range(records)
+    ]
+    return mobj
+
+
+def generate_corpus(directory: pathlib.Path, files: int, records: int, keys: int, frame_count: int, seed: int = 0) -> list[pathlib.Path]:
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for i in range(files):
+        path = directory / f"bench_{i:05d}.mot"
+        mobj = generate_mot(rng, records, keys, frame_count, name=f"bench_{i:05d}")
+        with open(path, "wb") as fobj:
+            mobj.writeToFile(fobj)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output", help="output directory", type=str)
+    parser.add_argument("--files", help="number of .mot files", type=int, default=20)
+    parser.add_argument("--records", help="records per file", type=int, default=270)
+    parser.add_argument("--keys", help="keys per track", type=int, default=60)
+    parser.add_argument("--frame-count", help="header frameCount", type=int, default=240)
+    parser.add_argument("--seed", help="random seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = generate_corpus(pathlib.Path(args.output), args.files, args.records, args.keys, args.frame_count, args.seed)
+    print(f"> {len(paths)} file(s) written to {args.output}")
@@ -0,0 +1,173 @@
+"""
+Throughput benchmarks for parse, task apply, match, write, JSON dump and
+curve sampling.
+
+A synthetic corpus is generated (or an existing directory of .mot files is
+used), every phase is timed separately over the whole corpus and the best of
+--repeat runs is reported. Results go to a JSON file so runs can be compared
+over time.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import pathlib
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from package import mot
+from package import motJson
+from package import task
+
+import corpus
+
+# bone-specific tasks like the ones used on real animation packs
+def _bench_task(bones: int = 64) -> list[dict]:
+    tasks = []
+    for bone in range(bones):
+        tasks.append({
+            "description": f"offset bone {bone:#x} location.y",
+            "conditions": [
+                {"field": "boneIndex", "operator": "==", "value": bone},
+                {"field": "propertyIndex", "operator": "==", "value": 1}
+            ],
+            "modifications": [
+                {"operator": "*", "value": 1.01},
+                {"operator": "+", "value": 0.001}
+            ]
+        })
+    return tasks
+
+
+def _best_of(repeat: int, fn) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _parse_all(buffers: list[bytes], lazy: bool) -> list[mot.MotFile]:
+    mobjs = []
+    for buffer in buffers:
+        mobj = mot.MotFile()
+        mobj.fromBuffer(buffer, lazy)
+        mobjs.append(mobj)
+    return mobjs
+
+
+def run(files: list[pathlib.Path], repeat: int, plan: task.TaskPlan) -> dict:
+    buffers = [file.read_bytes() for file in files]
+    total_bytes = sum(len(buffer) for buffer in buffers)
+    eager = _parse_all(buffers, lazy=False)
+    records = sum(len(mobj.records) for mobj in eager)
+
+    # the task engine reports matches on stderr, keep it out of the timings
+    quiet = contextlib.redirect_stderr(io.StringIO())
+
+    def apply():
+        with quiet:
+            for mobj in _parse_all(buffers, lazy=True):
+                plan.applyFile(mobj)
+
+    def match():
+        with quiet:
+            for mobj in _parse_all(buffers, lazy=True):
+                plan.matchFile(mobj)
+
+    def write():
+        for mobj in eager:
+            mobj.toBuffer()
+
+    def dump():
+        for mobj in _parse_all(buffers, lazy=True):
+            motJson.dumpMotFile(mobj, io.StringIO())
+
+    def sample():
+        for mobj in eager:
+            for record in mobj.records:
+                record.invalidateSamples()
+            mobj.sample()
+
+    phases = {
+        "parse": lambda: _parse_all(buffers, lazy=False),
+        "parse_lazy": lambda: _parse_all(buffers, lazy=True),
+        "apply": apply,
+        "match": match,
+        "write": write,
+        "json_dump": dump,
+        "sample": sample
+    }
+    results = {}
+    for name, fn in phases.items():
+        seconds = _best_of(repeat, fn)
+        results[name] = {
+            "seconds": seconds,
+            "files_per_s": len(files) / seconds if seconds > 0 else None,
+            "records_per_s": records / seconds if seconds > 0 else None,
+            "mb_per_s": total_bytes / 1e6 / seconds if seconds > 0 else None
+        }
+    return {
+        "corpus": {"files": len(files), "records": records, "bytes": total_bytes},
+        "results": results
+    }
+
+
+def _environment() -> dict:
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "numpy": numpy_version,
+        "cpu_count": os.cpu_count()
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="directory of .mot files to use instead of a generated corpus", type=str)
+    parser.add_argument("--task", help="task file, a bone-specific synthetic task by default", type=str)
+    parser.add_argument("--files", help="generated files", type=int, default=20)
+    parser.add_argument("--records", help="records per generated file", type=int, default=270)
+    parser.add_argument("--keys", help="keys per generated track", type=int, default=60)
+    parser.add_argument("--frame-count", help="frameCount of generated files", type=int, default=240)
+    parser.add_argument("--seed", help="random seed of the generated corpus", type=int, default=0)
+    parser.add_argument("--repeat", help="runs per phase, the best is kept", type=int, default=3)
+    parser.add_argument("--output", "-o", help="JSON result file", type=str, default="bench_result.json")
+    args = parser.parse_args()
+
+    plan = task.load(args.task) if args.task is not None else task.TaskPlan(_bench_task())
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if args.corpus is not None:
+            files = sorted(pathlib.Path(args.corpus).glob("*.mot"))
+        else:
+            files = corpus.generate_corpus(
+                pathlib.Path(tmpdir), args.files, args.records, args.keys, args.frame_count, args.seed
+            )
+        report = run(files, args.repeat, plan)
+
+    report["environment"] = _environment()
+    report["parameters"] = {
+        key: getattr(args, key)
+        for key in ("corpus", "task", "files", "records", "keys", "frame_count", "seed", "repeat")
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"> {report['corpus']['files']} file(s), {report['corpus']['records']} record(s), {report['corpus']['bytes']} byte(s)")
+    for name, result in report["results"].items():
+        print(f"  {name:<12} {result['seconds'] * 1000:10.2f} ms  {result['files_per_s']:10.1f} files/s  {result['mb_per_s']:8.2f} MB/s")
+    print(f"> Result written to {args.output}")
@@ -1,9 +1,23 @@
 import os
 import argparse
+import collections
+import contextlib
+import fnmatch
+import io
+import itertools
 import pathlib
 import sys
+import time
+from typing import Callable, Iterable
 
+from package import archive
+from package import cache
 from package import mot
+from package import motIndex
+from package import motJson
+from package import motNpz
+from package import motOptimize
+from package import profiler
 from package import task
 
 def _check_magic(file: str, magic: str):
@@ -16,138 +30,752 @@ def _check_magic(file: str, magic: str):
     return True
 
 
-def _dump_json_to_file(file: str, mobj: mot):    
-    import jsonpickle # pip install jsonpickle
-    import json
+class ArchiveOutput:
+    """
+    Output archive given as --output. Actions collect their outputs here (in
+    the worker when --jobs is used), the main process writes them into the
+    archive in input order.
+    """
+    path: pathlib.Path
+    entries: list[tuple[str, bytes]]
 
-    serialized = jsonpickle.encode(mobj)
-    with open(file, "w") as f:
-        json.dump(json.loads(serialized), fp=f, indent=2)
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.entries = []
 
+    def take(self) -> list[tuple[str, bytes]]:
+        entries, self.entries = self.entries, []
+        return entries
+
+
+class RefusedFile:
+    """An input left out of the batch, reported as a failed file with error"""
+    file: pathlib.Path
+    error: str
+
+    def __init__(self, file: pathlib.Path, error: str):
+        self.file = file
+        self.error = error
+
+    @property
+    def name(self) -> str:
+        return self.file.name
+
+    def __str__(self) -> str:
+        return str(self.file)
+
+
+def _scan_root(args: argparse, path: pathlib.Path) -> str|None:
+    # the directory argument path was found in, the closest one when they nest
+    path = os.path.abspath(path)
+    roots = [os.path.abspath(arg) for arg in args.files if os.path.isdir(arg)]
+    roots = [root for root in roots if os.path.commonpath((root, path)) == root]
+    return max(roots, key=len) if roots else None
+
+
+def _output_name(args: argparse, basepath: pathlib.Path|ArchiveOutput, file: pathlib.Path, name: str) -> str:
+    """
+    Name of an output of file below the output directory (next to the input
+    when basepath is None) or in the output archive. The directory of an
+    archive member is kept, under --output also the directory of the input
+    below the directory argument it was found in, so inputs of the same name
+    do not overwrite each other.
+    """
+    source = file.archive if isinstance(file, archive.ArchiveMember) else file
+    parts = []
+    if basepath is not None:
+        root = _scan_root(args, source)
+        if root is not None:
+            parts.extend(pathlib.Path(os.path.relpath(os.path.dirname(os.path.abspath(source)), root)).parts)
+    if isinstance(file, archive.ArchiveMember):
+        parts.extend(pathlib.PurePosixPath(file.member).parent.parts)
+    # ".", ".." and absolute member names stay inside the output
+    parts = [part for part in parts if part not in (".", "..", "/")]
+    return "/".join([*parts, name])
+
+
+@contextlib.contextmanager
+def _open_output(args: argparse, basepath: pathlib.Path|ArchiveOutput, file: pathlib.Path, name: str, mode: str):
+    # into the output archive, the output directory or next to the input (the archive holding it)
+    name = _output_name(args, basepath, file, name)
+    if isinstance(basepath, ArchiveOutput):
+        buffer = io.BytesIO() if "b" in mode else io.StringIO()
+        yield buffer
+        data = buffer.getvalue()
+        basepath.entries.append((name, data if isinstance(data, bytes) else data.encode("utf-8")))
+        return
+    path = (basepath if basepath is not None else file.parent) / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, mode) as f:
+        yield f
+
+
+def _read_input(file: pathlib.Path) -> bytes:
+    # files and archive members alike, read_bytes of an archive member is already in memory
+    prof = profiler.active
+    if prof is not None:
+        prof.begin("read")
+    buffer = file.read_bytes()
+    if prof is not None:
+        prof.end()
+        prof.count("bytesRead", len(buffer))
+    return buffer
+
+
+def _load_mot(file: pathlib.Path) -> mot.MotFile:
+    mobj = mot.MotFile()
+    mobj.fromBuffer(_read_input(file), lazy=True)
+    return mobj
+
+
+def _dump_json_to_file(f, mobj: mot.MotFile, args: argparse):
+    motJson.dumpMotFile(mobj, f, indent=None if args.compact else 2)
+
+
+def dump_mot_as_json(args: argparse, file: pathlib.Path, basepath: pathlib.Path, plan: task.TaskPlan) -> bool:
+    # the dumper decodes one payload at a time
+    mobj = _load_mot(file)
+
+    print(f"+ {file.name}: ")
+
+    with _open_output(args, basepath, file, f"{file.name}.json", "w") as f:
+        _dump_json_to_file(f, mobj, args)
+    return True
+
+
+def _apply_output_path(args: argparse, file: pathlib.Path, basepath: pathlib.Path) -> pathlib.Path:
+    return (basepath if basepath is not None else file.parent) / _output_name(args, basepath, file, f"mod_{file.name}")
+
+
+def apply_and_export(args: argparse, file: pathlib.Path, basepath: pathlib.Path, plan: task.TaskPlan) -> bool:
+    ofilename = f"mod_{file.name}"
+
+    # payloads are decoded only for the records a task touches
+    mobj = _load_mot(file)
+
+    print(f"+ {file.name}: ")
+
+    if args.debug:
+        with _open_output(args, basepath, file, f"{file.name}.json", "w") as f:
+            _dump_json_to_file(f, mobj, args)
+
+    ret = plan.applyFile(mobj)
+
+    # if no modification applied, do not write out mot object
+    if not ret:
+        return False
+
+    with _open_output(args, basepath, file, ofilename, "wb") as fobj:
+        mobj.writeToFile(fobj, patch=args.patch, dedupe=args.dedupe)
+    if args.dedupe:
+        print(f"{mobj.dedupedBytes} payload bytes deduplicated")
+
+    if args.debug:
+        with _open_output(args, basepath, file, f"{ofilename}.json", "w") as f:
+            _dump_json_to_file(f, mobj, args)
+    return True
 
-def dump_mot_as_json(args: argparse, files: list[pathlib.Path], basepath: pathlib.Path):
-    for file in files:
-        if basepath is not None:
-            ofilepath = basepath / f"{file.name}.json"
-        else:
-            ofilepath = file.parent / f"{file.name}.json"
 
-        mobj = mot.MotFile()
-        with open(str(file), "rb") as fobj:
-            mobj.fromFile(fobj)
+def match(args: argparse, file: pathlib.Path, output_path: pathlib.Path, plan: task.TaskPlan) -> bool:
+    mobj = _load_mot(file)
 
-        print(f"+ {file.name}: ")
+    print(f"+ {file.name}: ")
+    return plan.matchFile(mobj)
 
-        _dump_json_to_file(str(ofilepath), mobj)
 
+def export_npz(args: argparse, file: pathlib.Path, basepath: pathlib.Path, plan: task.TaskPlan) -> dict:
+    mobj = _load_mot(file)
 
-def apply_and_export(args: argparse, files: list[pathlib.Path], basepath: pathlib.Path):
+    print(f"+ {file.name}: ")
+    return motNpz.fileColumns(mobj)
+
+
+def optimize(args: argparse, file: pathlib.Path, basepath: pathlib.Path, plan: task.TaskPlan) -> bool:
+    ofilename = f"mod_{file.name}"
+
+    buffer = _read_input(file)
+    mobj = mot.MotFile()
+    mobj.fromBuffer(buffer, lazy=True)
+
+    print(f"+ {file.name}: ")
+
+    if args.debug:
+        with _open_output(args, basepath, file, f"{file.name}.json", "w") as f:
+            _dump_json_to_file(f, mobj, args)
+
+    changes = motOptimize.optimizeFile(mobj, args.tolerance)
+    for i, old_type, new_type, old_size, new_size, error in changes:
+        print(f"Record[{i}] type {old_type} -> {new_type}, {old_size} -> {new_size} bytes, max error: {error:g}", file=sys.stderr)
+
+    output = mobj.toBuffer(dedupe=args.dedupe)
+    saved = len(buffer) - len(output)
+    deduped = f" ({mobj.dedupedBytes} deduplicated)" if args.dedupe else ""
+    print(f"{len(changes)} record(s) re-encoded, {len(buffer)} -> {len(output)} bytes, {saved} saved{deduped}")
+
+    # only a smaller file is written out
+    if saved <= 0:
+        return False
+
+    prof = profiler.active
+    if prof is not None:
+        prof.begin("write")
+    with _open_output(args, basepath, file, ofilename, "wb") as fobj:
+        fobj.write(output)
+    if prof is not None:
+        prof.end()
+        prof.count("bytesWritten", len(output))
+        prof.count("bytesSaved", saved)
+
+    if args.debug:
+        with _open_output(args, basepath, file, f"{ofilename}.json", "w") as f:
+            _dump_json_to_file(f, mobj, args)
+    return True
+
+
+action_table = {
+    "dump": dump_mot_as_json,
+    "apply_and_export": apply_and_export,
+    "match": match,
+    "export_npz": export_npz,
+    "optimize": optimize
+}
+
+# actions compiling args.task, and the summary wording of their per-file result
+action_task_required = {"apply_and_export", "match"}
+action_result_label = {
+    "dump": "dumped",
+    "apply_and_export": "modified",
+    "match": "matched",
+    "export_npz": "exported",
+    "optimize": "optimized",
+    "index": "indexed"
+}
+# actions writing outputs named after their input, which must not collide
+action_named_outputs = {"dump", "apply_and_export", "optimize"}
+# actions returning per-file data which the main process joins into one output
+action_collected = {"export_npz"}
+# actions run on the record index (--index) in the main process, not by action_table
+action_indexed = {"index"}
+
+
+class FileResult:
+    file: pathlib.Path
+    modified: bool
+    cached: bool
+    error: str|None
+    output: str
+    log: str
+    # (name, bytes) written into the output archive
+    outputs: list[tuple[str, bytes]]
+    # profiler.Profiler.toJson of the file with --profile
+    profile: dict|None
+    # data returned by the actions of action_collected
+    collected: object
+
+    def __init__(self, file: pathlib.Path):
+        self.file = file
+        self.modified = False
+        self.cached = False
+        self.error = None
+        self.output = ""
+        self.log = ""
+        self.outputs = []
+        self.profile = None
+        self.collected = None
+
+
+def _load_plan(args: argparse) -> task.TaskPlan|None:
+    if args.action not in action_task_required:
+        return None
     if args.task is None:
         raise UserWarning("No task specified ...")
+    return task.load(args.task)
+
+
+def _process_file(args: argparse, file: pathlib.Path, basepath: pathlib.Path, plan: task.TaskPlan, capture: bool) -> FileResult:
+    # errors are kept per file, captured output lets the caller print results in input order
+    import traceback
+
+    if isinstance(file, RefusedFile):
+        result = FileResult(file.file)
+        result.error = file.error
+        return result
+    result = FileResult(file)
+    out, err = io.StringIO(), io.StringIO()
+    # each file is profiled on its own, the main process adds up the reports (also from workers)
+    prof = profiler.Profiler() if args.profile is not None else None
+    profiler.active = prof
+    with contextlib.ExitStack() as stack:
+        if capture:
+            stack.enter_context(contextlib.redirect_stdout(out))
+            stack.enter_context(contextlib.redirect_stderr(err))
+        try:
+            ret = action_table[args.action](args, file, basepath, plan)
+            if args.action in action_collected:
+                result.collected = ret
+                result.modified = True
+            else:
+                result.modified = ret
+        except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
+            if args.debug:
+                traceback.print_exc()
+        finally:
+            profiler.active = None
+    if prof is not None:
+        prof.unwind()
+        result.profile = prof.toJson()
+    if isinstance(basepath, ArchiveOutput):
+        result.outputs = basepath.take()
+    result.output = out.getvalue()
+    result.log = err.getvalue()
+    return result
+
+
+_worker_plan = None
+
+def _init_worker(args: argparse):
+    global _worker_plan
+    _worker_plan = _load_plan(args)
+
+
+def _worker_process_file(args: argparse, file: pathlib.Path, basepath: pathlib.Path) -> FileResult:
+    return _process_file(args, file, basepath, _worker_plan, capture=True)
+
+
+def _run_files(args: argparse, files: Iterable[pathlib.Path], basepath: pathlib.Path, plan: task.TaskPlan = None, capture: bool = False):
+    if plan is None:
+        plan = _load_plan(args)
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    if jobs <= 1:
+        for file in files:
+            yield _process_file(args, file, basepath, plan, capture=capture)
+        return
 
+    import concurrent.futures
+
+    # every worker compiles the task file once, results come back in input order;
+    # files are pulled from the discovery as the window drains so it never runs far ahead
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(args,)) as executor:
+        window = collections.deque()
+        for file in files:
+            window.append(executor.submit(_worker_process_file, args, file, basepath))
+            if len(window) >= jobs * 4:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+
+def _scanned(args: argparse, root: str, path: str) -> bool:
+    # whether the directory argument root takes the file path, the checks of discover_files
+    relpath = os.path.relpath(path, root).replace(os.sep, "/")
+    parts = relpath.split("/")
+    if parts[0] == ".." or (not args.recursive and len(parts) > 1) or not os.path.isfile(path):
+        return False
+    exclude = args.exclude or []
+    if any(_matches_any(part, "/".join(parts[:i + 1]), exclude) for i, part in enumerate(parts)):
+        return False
+    return _matches_any(parts[-1], relpath, args.include or ["*.mot"])
+
+
+def _unique_outputs(args: argparse, files: Iterable[pathlib.Path], basepath: pathlib.Path|ArchiveOutput):
+    """
+    Pass files on, the ones whose outputs would get the name of another
+    input's outputs (files of the same name from two arguments) as a
+    RefusedFile instead of overwriting them; the same input given twice
+    writes the same outputs. Files of one directory argument never collide,
+    so for them only the output directories are kept, each with the
+    directory arguments writing into it, and a name is looked up on disk in
+    the other arguments; only the names of file arguments and archive
+    members are kept.
+    """
+    directories = {}
+    names = {}
     for file in files:
-        if basepath is not None:
-            ofilepath = basepath / f"mod_{file.name}"
-        else:
-            ofilepath = file.parent / f"mod_{file.name}"
-    
-        mobj = mot.MotFile()
-        with open(str(file), "rb") as fobj:
-            mobj.fromFile(fobj)
+        name = _output_name(args, basepath, file, file.name)
+        key = os.path.join(os.path.abspath(file.parent), name) if basepath is None else name
+        directory = os.path.dirname(key)
+        member = isinstance(file, archive.ArchiveMember)
+        root = None if member else _scan_root(args, file)
+
+        other = names.get(key)
+        if other is None:
+            for claim in directories.get(directory, ()):
+                candidate = os.path.join(claim, directory, file.name)
+                if claim != root and _scanned(args, claim, candidate) and (member or not os.path.samefile(candidate, file)):
+                    other = candidate
+                    break
+        if other is not None and other != str(file):
+            yield RefusedFile(file, f"output name {name} already taken by {other}")
+            continue
 
-        print(f"+ {file.name}: ")
+        if root is None:
+            names[key] = str(file)
+        elif root not in directories.setdefault(directory, []):
+            directories[directory].append(root)
+        yield file
 
-        if args.debug:
-            if basepath is not None:
-                debug_json_filepath = basepath / f"{file.name}.json"
+
+def _load_cache(args: argparse, basepath: pathlib.Path) -> cache.ResultCache|None:
+    # only apply_and_export results are cached, --debug always rebuilds its json files,
+    # an output archive is rewritten as a whole
+    if args.action != "apply_and_export" or args.no_cache or args.debug or args.task is None:
+        return None
+    if isinstance(basepath, ArchiveOutput):
+        return None
+    cache_path = args.cache_file
+    if cache_path is None:
+        cache_path = str((basepath if basepath is not None else pathlib.Path.cwd()) / cache.DEFAULT_CACHE_NAME)
+    return cache.ResultCache.load(cache_path, args.cache_size)
+
+
+def _cached_result(file: pathlib.Path) -> FileResult:
+    result = FileResult(file)
+    result.cached = True
+    result.output = f"= {file.name}: up to date\n"
+    return result
+
+
+def _run_cached(args: argparse, files: Iterable[pathlib.Path], basepath: pathlib.Path, results_cache: cache.ResultCache,
+                plan: task.TaskPlan = None, capture: bool = False):
+    # files whose input, task and output are unchanged since the last run are skipped
+    task_hash = cache.hashTaskFile(args.task)
+    options = f"patch={args.patch}" + (",dedupe=True" if args.dedupe else "")
+    # (file, (key, output path)) in input order, None for the files answered by the cache
+    pending = collections.deque()
+
+    def misses():
+        for file in files:
+            if isinstance(file, RefusedFile):
+                # reported as failed, the output belongs to another input
+                pending.append((file, (None, None)))
+                yield file
+                continue
+            output_path = str(_apply_output_path(args, file, basepath).resolve())
+            key = cache.ResultCache.makeKey(cache.hashBytes(file.read_bytes()), task_hash, output_path, options)
+            if results_cache.lookup(key):
+                pending.append((file, None))
             else:
-                debug_json_filepath = file.parent / f"{file.name}.json"
-            _dump_json_to_file(str(debug_json_filepath), mobj)
+                pending.append((file, (key, output_path)))
+                yield file
+
+    for result in _run_files(args, misses(), basepath, plan, capture):
+        while pending[0][1] is None:
+            yield _cached_result(pending.popleft()[0])
+        file, (key, output_path) = pending.popleft()
+        if key is None:
+            pass
+        elif result.error is not None:
+            results_cache.discard(key)
+        else:
+            results_cache.store(key, output_path if result.modified else None)
+        yield result
+    while pending:
+        yield _cached_result(pending.popleft()[0])
 
-        ret = False
-        for it in enumerate(mobj.records):
-            ret = ret | task.apply(args.task, it)
 
-        # if no modification applied, do not write out mot object
-        if not ret:
+def _index_path(args: argparse, basepath: pathlib.Path) -> str:
+    if args.index is not None:
+        return args.index
+    return str((basepath if isinstance(basepath, pathlib.Path) else pathlib.Path.cwd()) / motIndex.DEFAULT_INDEX_NAME)
+
+
+def _index_file(mindex: motIndex.MotIndex, file: pathlib.Path) -> tuple[int, bool]:
+    if isinstance(file, archive.ArchiveMember):
+        # members are compared by content, the archive mtime covers all of them
+        source = os.path.abspath(file.archive)
+        return mindex.refresh(f"{source}:{file.member}", source, None, file.read_bytes)
+    path = os.path.abspath(file)
+    st = file.stat()
+    return mindex.refresh(path, path, (st.st_mtime_ns, st.st_size), file.read_bytes)
+
+
+def _run_index(args: argparse, files: Iterable[pathlib.Path], basepath: pathlib.Path, plan: task.TaskPlan = None):
+    # one process owns the database; stale files are indexed again before they are queried
+    with motIndex.MotIndex(_index_path(args, basepath)) as mindex:
+        if args.action == "index":
+            for file in files:
+                result = FileResult(file)
+                try:
+                    _, result.modified = _index_file(mindex, file)
+                    result.output = f"+ {file.name}: indexed\n" if result.modified else f"= {file.name}: up to date\n"
+                except Exception as e:
+                    result.error = f"{type(e).__name__}: {e}"
+                yield result
+            removed = mindex.removeMissing(os.path.exists)
+            if removed > 0:
+                print(f"> {removed} file(s) no longer found, removed from the index")
+            return
+
+        if plan is None:
+            plan = _load_plan(args)
+        indexed = []
+        for file in files:
+            result = FileResult(file)
+            file_id = None
+            try:
+                file_id, _ = _index_file(mindex, file)
+            except Exception as e:
+                result.error = f"{type(e).__name__}: {e}"
+            indexed.append((result, file_id))
+        mindex.commit()
+
+        # the same report as match, in record then task order
+        matches = mindex.match(plan, [file_id for _, file_id in indexed if file_id is not None])
+        for result, file_id in indexed:
+            if file_id is not None:
+                found = matches.get(file_id, [])
+                result.output = f"+ {result.file.name}: \n"
+                result.log = "".join(
+                    f"Record[{record}] matches conditions ...\n"
+                    + "\n".join(cond.describe(value) for cond, value in zip(plan.tasks[task_number].conditions, values)) + "\n"
+                    for record, task_number, values in found
+                )
+                result.modified = len(found) > 0
+            yield result
+
+
+def _matches_any(name: str, relpath: str, patterns: list[str]) -> bool:
+    return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relpath, pattern) for pattern in patterns)
+
+
+def _scan_directory(root: pathlib.Path, recursive: bool, include: list[str], exclude: list[str], skip: str|None):
+    """
+    Yield the files under root matching include and none of exclude, patterns
+    are tried on the entry name and on its path relative to root. Entries are
+    listed one directory at a time (sorted), symlinked directories are
+    followed once so a link back to an ancestor does not loop, and the
+    directory skip (the output directory) is not entered.
+    """
+    visited = set()
+    stack = [(str(root), "")]
+    while stack:
+        directory, reldir = stack.pop()
+        try:
+            st = os.stat(directory)
+        except OSError as e:
+            print(f"! {directory}: {e}", file=sys.stderr)
             continue
-        
-        with open(ofilepath, "wb") as fobj:
-            mobj.writeToFile(fobj)
+        if (st.st_dev, st.st_ino) in visited:
+            continue
+        visited.add((st.st_dev, st.st_ino))
 
-        if args.debug:
-            debug_json_filepath = ofilepath.parent / f"{ofilepath.name}.json"
-            _dump_json_to_file(str(debug_json_filepath), mobj)
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"! {directory}: {e}", file=sys.stderr)
+            continue
 
+        subdirs = []
+        for entry in entries:
+            relpath = f"{reldir}{entry.name}"
+            if _matches_any(entry.name, relpath, exclude):
+                continue
+            try:
+                is_dir = entry.is_dir()
+                is_file = not is_dir and entry.is_file()
+            except OSError:
+                continue
+            if is_dir:
+                if recursive and os.path.realpath(entry.path) != skip:
+                    subdirs.append((entry.path, f"{relpath}/"))
+            elif is_file and _matches_any(entry.name, relpath, include):
+                yield pathlib.Path(entry.path)
+        # depth first, in name order
+        stack.extend(reversed(subdirs))
 
-def match(args: argparse, files: list[pathlib.Path], output_path: pathlib.Path):
-    if args.task is None:
-        raise UserWarning("No task specified ...")
-    
-    for file in files:
-        mobj = mot.MotFile()
-        with open(str(file), "rb") as fobj:
-            mobj.fromFile(fobj)
 
-        print(f"+ {file.name}: ")
-        ret = False
-        for it in enumerate(mobj.records):
-            ret = ret | task.match(args.task, it)
+def _accept_member(member: str, include: list[str], exclude: list[str]) -> bool:
+    name = member.rsplit("/", 1)[-1]
+    return _matches_any(name, member, include) and not _matches_any(name, member, exclude)
 
 
-action_table = {
-    "dump": dump_mot_as_json,
-    "apply_and_export": apply_and_export,
-    "match": match
-}
+def discover_files(args: argparse):
+    include = args.include or ["*.mot"]
+    exclude = args.exclude or []
+    for arg in args.files:
+        pth = pathlib.Path(arg)
+        if pth.is_file():
+            if archive.isArchive(pth):
+                # members are read one by one while the files are processed
+                print(f"> Expand the archive {pth.name} ...")
+                yield from archive.iterMembers(pth, lambda member: _accept_member(member, include, exclude))
+                continue
+            if pth.suffix != ".mot":
+                continue
+            yield pth
+        elif pth.is_dir():
+            print(f"> Expand the directory{' (recursive)' if args.recursive else ' (no nested expand)'} ...")
+            skip = os.path.realpath(args.output) if args.output is not None else None
+            yield from _scan_directory(pth, args.recursive, include, exclude, skip)
 
 
-def main(args: argparse, files: list[pathlib.Path], output_path: pathlib.Path):
-    if args.action in action_table:
-        action_table[args.action](args, files, output_path)
+def _save_corpus(args: argparse, corpus: motNpz.CorpusBuilder, output_path: pathlib.Path, writer: archive.ArchiveWriter|None):
+    arrays = corpus.toArrays()
+    if writer is not None:
+        for name, data in motNpz.corpusEntries(arrays, motNpz.DEFAULT_CORPUS_NAME, args.npy):
+            writer.write(name, data)
         return
-    raise UserWarning("Not supported action ...")
+    directory = output_path if output_path is not None else pathlib.Path.cwd()
+    corpus_path = directory / (motNpz.DEFAULT_CORPUS_NAME if args.npy else f"{motNpz.DEFAULT_CORPUS_NAME}.npz")
+    motNpz.saveCorpus(arrays, corpus_path, args.npy)
+    print(f"> Corpus of {len(corpus.names)} file(s), {len(arrays['records.file'])} record(s), {len(arrays['keys.frame'])} key(s) written to {corpus_path}")
+
+
+def main(args: argparse, files: Iterable[pathlib.Path], output_path: pathlib.Path,
+         plan: task.TaskPlan = None, on_result: Callable[[FileResult], None] = None) -> int:
+    """
+    Run args.action over files, returns the number of failed files. plan is
+    the compiled args.task when the caller keeps it (worker.py); with
+    on_result every FileResult is handed over (its output captured) instead
+    of being printed.
+    """
+    if args.action not in action_table and args.action not in action_indexed:
+        raise UserWarning("Not supported action ...")
+    if args.action == "export_npz" and motNpz.np is None:
+        raise UserWarning("Action export_npz requires numpy ...")
+    if args.action == "optimize" and motOptimize.np is None:
+        raise UserWarning("Action optimize requires numpy ...")
+    if args.tolerance < 0:
+        raise UserWarning("Argument \"tolerance\" must not be negative")
+
+    if args.action in action_named_outputs:
+        files = _unique_outputs(args, files, output_path)
+    results_cache = _load_cache(args, output_path)
+    capture = on_result is not None
+    if args.action in action_indexed or (args.action == "match" and args.index is not None):
+        results = _run_index(args, files, output_path, plan)
+    elif results_cache is not None:
+        results = _run_cached(args, files, output_path, results_cache, plan, capture)
+    else:
+        results = _run_files(args, files, output_path, plan, capture)
+
+    writer = archive.ArchiveWriter(output_path.path) if isinstance(output_path, ArchiveOutput) else None
+    prof = profiler.Profiler() if args.profile is not None else None
+    start = time.perf_counter()
+    corpus = motNpz.CorpusBuilder() if args.action == "export_npz" else None
+
+    processed = modified = cached = failed = 0
+    try:
+        for result in results:
+            if on_result is not None:
+                on_result(result)
+            else:
+                sys.stdout.write(result.output)
+                sys.stderr.write(result.log)
+                if result.error is not None:
+                    print(f"! {result.file}: {result.error}", file=sys.stderr)
+            if prof is not None and result.profile is not None:
+                prof.merge(result.profile)
+            if writer is not None:
+                for name, data in result.outputs:
+                    writer.write(name, data)
+            if corpus is not None and result.collected is not None:
+                corpus.add(str(result.file), result.collected)
+            processed += 1
+            if result.error is not None:
+                failed += 1
+            elif result.cached:
+                cached += 1
+            elif result.modified:
+                modified += 1
+
+        if corpus is not None and processed > failed:
+            _save_corpus(args, corpus, output_path, writer)
+    finally:
+        if results_cache is not None:
+            results_cache.save()
+        if writer is not None:
+            writer.close()
+
+    summary = f"> {processed} file(s) processed, {modified} {action_result_label[args.action]}, {failed} failed"
+    if results_cache is not None:
+        summary += f", {cached} up to date"
+    print(summary)
+    if prof is not None:
+        wall = time.perf_counter() - start
+        prof.save(args.profile, wall)
+        print(prof.summary(wall))
+        print(f"> Profile written to {args.profile}")
+    return failed
         
 
-if __name__ == "__main__":
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser()
-    parser.add_argument("--action", "-a", help="specified the action for cli", type=str, choices=[k for k in action_table], required=True)
-    parser.add_argument("--output", "-o", help="output directory", type=str)
+    parser.add_argument("--action", "-a", help="specified the action for cli", type=str, choices=[*action_table, *sorted(action_indexed)], required=True)
+    parser.add_argument("--output", "-o", help="output directory, or an archive (.zip / .tar / .tar.gz / .tar.bz2 / .tar.xz) to write into", type=str)
     parser.add_argument("--task", "-t", help="Task file for modifying the mot file", type=str)
     parser.add_argument("--debug", "-d", help="Generate debug information", action="store_true")
-    parser.add_argument('files', help="file .mot or directory includes .mot", nargs='+')
-    args = parser.parse_args()
+    parser.add_argument("--patch", help="Write modified files as a patched copy of the input when the layout is unchanged", action="store_true")
+    parser.add_argument("--dedupe", help="Write identical payloads of a file once, shared by their records (bytes saved are reported)", action="store_true")
+    parser.add_argument("--compact", help="Write JSON dumps without indentation", action="store_true")
+    parser.add_argument("--jobs", "-j", help="Number of worker processes, 0 for one per CPU", type=int, default=1)
+    parser.add_argument("--no-cache", help="Rebuild every file instead of skipping the ones unchanged since the last apply_and_export", action="store_true")
+    parser.add_argument("--cache-file", help=f"Result cache of apply_and_export, default {cache.DEFAULT_CACHE_NAME} in the output directory", type=str)
+    parser.add_argument("--cache-size", help="Maximum number of cached results", type=int, default=cache.DEFAULT_CACHE_CAPACITY)
+    parser.add_argument("--recursive", "-r", help="Expand directories recursively", action="store_true")
+    parser.add_argument("--include", help="Pattern of the files taken from directories, repeatable, default *.mot", action="append")
+    parser.add_argument("--exclude", help="Pattern of the files / directories skipped in directories, repeatable", action="append")
+    parser.add_argument("--npy", help="Write the export_npz corpus as a directory of memory-mappable .npy files instead of one compressed .npz", action="store_true")
+    parser.add_argument("--index", help=f"Record index database of the index action, queried by match when given, default {motIndex.DEFAULT_INDEX_NAME} in the output directory", type=str)
+    parser.add_argument("--tolerance", help=f"Largest error per frame the optimize action may introduce, default {motOptimize.DEFAULT_TOLERANCE:g} (lossless)", type=float, default=motOptimize.DEFAULT_TOLERANCE)
+    parser.add_argument("--profile", help="Write per-phase / per-interpolation-type timings and counters as JSON to PROFILE and print a summary", type=str)
+    parser.add_argument('files', help="file .mot, directory or archive (.zip / .tar[.gz|.bz2|.xz]) includes .mot", nargs='+')
+    return parser
+
 
+def prepare_files(args: argparse) -> Iterable[pathlib.Path]|None:
+    """Files of args.files as they are discovered, None when there is none"""
     # check ambiguous arguments here
-    file_list = []
     for arg in args.files:
         pth = pathlib.Path(arg)
-        if pth.is_file():
-            if pth.suffix != ".mot":
-                continue
-            file_list.append(pth)
-        elif pth.is_dir():
-            print("> Expand the directory (no nested expand) ...")
-            file_list.extend([child for child in pth.glob("*.mot") if child.is_file()])
-        else:
+        if not pth.is_file() and not pth.is_dir():
             raise UserWarning(f"Unsupported file type ... {pth.absolute()}")
     '''
     for file in file_list:
         if not _check_magic(str(file), "mot"):
             raise UserWarning(f"Not supported mot file ... {file.absolute()}")
     '''
-    if len(file_list) == 0:
-        parser.print_help()
-        raise UserWarning(f"No valid file ...")
+    # directories are expanded while the files are processed
+    file_iter = discover_files(args)
+    first_file = next(file_iter, None)
+    if first_file is None:
+        return None
+    return itertools.chain((first_file,), file_iter)
 
+
+def prepare_output(args: argparse) -> pathlib.Path|ArchiveOutput|None:
     # check output here
     basepath = None
-    if args.output is not None:
+    if args.output is not None and archive.isArchive(args.output):
+        basepath = ArchiveOutput(pathlib.Path(args.output))
+        if basepath.path.is_dir():
+            raise UserWarning("Argument \"output\" targets a directory named as an archive")
+        if any(pathlib.Path(arg).resolve() == basepath.path.resolve() for arg in args.files):
+            raise UserWarning("Argument \"output\" is one of the input archives")
+        if not basepath.path.parent.exists():
+            print("> Create output directory ...")
+            basepath.path.parent.mkdir(parents=True)
+    elif args.output is not None:
         basepath = pathlib.Path(args.output)
         if not basepath.exists():
             print("> Create output directory ...")
             basepath.mkdir(parents=True)
         elif not basepath.is_dir():
             raise UserWarning("Argument \"output\" does not target directory")
+    return basepath
+
+
+if __name__ == "__main__":
+    parser = build_parser()
+    args = parser.parse_args()
+
+    file_list = prepare_files(args)
+    if file_list is None:
+        parser.print_help()
+        raise UserWarning(f"No valid file ...")
+    basepath = prepare_output(args)
 
-    main(args, file_list, basepath)
\ No newline at end of file
+    if main(args, file_list, basepath) > 0:
+        sys.exit(1)
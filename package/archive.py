@@ -0,0 +1,133 @@
+import io
+import pathlib
+import tarfile
+import time
+import zipfile
+from collections.abc import Callable, Iterator
+
+from . import mot
+
+# suffix -> tarfile compression ("" for plain tar), None for zip
+_archive_suffixes = {
+    ".zip": None,
+    ".tar": "",
+    ".tar.gz": "gz",
+    ".tgz": "gz",
+    ".tar.bz2": "bz2",
+    ".tbz2": "bz2",
+    ".tar.xz": "xz",
+    ".txz": "xz"
+}
+
+
+def archiveSuffix(path: str|pathlib.Path) -> str|None:
+    """The archive suffix of path (".zip", ".tar.gz", ...), None for other files"""
+    name = pathlib.Path(path).name.lower()
+    for suffix in sorted(_archive_suffixes, key=len, reverse=True):
+        if name.endswith(suffix):
+            return suffix
+    return None
+
+
+def isArchive(path: str|pathlib.Path) -> bool:
+    return archiveSuffix(path) is not None
+
+
+class ArchiveMember:
+    """
+    A member read from an archive. Offers the part of pathlib.Path the CLI
+    relies on: name (of the member), parent (of the archive) and read_bytes.
+    """
+    archive: pathlib.Path
+    member: str
+    data: bytes
+
+    def __init__(self, archive: pathlib.Path, member: str, data: bytes):
+        self.archive = archive
+        self.member = member
+        self.data = data
+
+    @property
+    def name(self) -> str:
+        return pathlib.PurePosixPath(self.member).name
+
+    @property
+    def parent(self) -> pathlib.Path:
+        return self.archive.parent
+
+    def read_bytes(self) -> bytes:
+        return self.data
+
+    def __str__(self) -> str:
+        return f"{self.archive}:{self.member}"
+
+
+def iterMembers(path: str|pathlib.Path, accept: Callable[[str], bool] = None) -> Iterator[ArchiveMember]:
+    """
+    Regular files of a zip / tar archive in archive order, read one at a time;
+    accept(member name) filters members before their data is read. Tar
+    archives are read as a stream.
+    """
+    path = pathlib.Path(path)
+    if archiveSuffix(path) == ".zip":
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or (accept is not None and not accept(info.filename)):
+                    continue
+                yield ArchiveMember(path, info.filename, zf.read(info))
+        return
+
+    with tarfile.open(path, "r|*") as tf:
+        for info in tf:
+            if not info.isfile() or (accept is not None and not accept(info.name)):
+                continue
+            yield ArchiveMember(path, info.name, tf.extractfile(info).read())
+
+
+def iterMotFiles(path: str|pathlib.Path, lazy: bool = False, accept: Callable[[str], bool] = None) -> Iterator[tuple[str, mot.MotFile]]:
+    """(member name, MotFile) for every .mot member (or every member accept allows)"""
+    if accept is None:
+        accept = lambda name: name.lower().endswith(".mot")
+    for member in iterMembers(path, accept):
+        mobj = mot.MotFile()
+        mobj.fromBuffer(member.data, lazy)
+        yield member.member, mobj
+
+
+class ArchiveWriter:
+    """Write named byte strings into a new zip / tar archive, the format follows the suffix"""
+    path: pathlib.Path
+
+    def __init__(self, path: str|pathlib.Path):
+        self.path = pathlib.Path(path)
+        suffix = archiveSuffix(self.path)
+        if suffix is None:
+            raise UserWarning(f"Unsupported archive type ... {self.path}")
+        if suffix == ".zip":
+            self._zip = zipfile.ZipFile(self.path, "w", zipfile.ZIP_DEFLATED)
+            self._tar = None
+        else:
+            compression = _archive_suffixes[suffix]
+            self._zip = None
+            self._tar = tarfile.open(self.path, f"w:{compression}" if compression else "w")
+
+    def write(self, name: str, data: bytes):
+        if self._zip is not None:
+            self._zip.writestr(name, data)
+            return
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self._tar.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+        else:
+            self._tar.close()
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
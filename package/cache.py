@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import time
+
+# bump when the bytes written for the same input / task change
+CACHE_VERSION = 2
+
+DEFAULT_CACHE_NAME = ".mot_cache.json"
+DEFAULT_CACHE_CAPACITY = 65536
+
+
+def hashBytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hashFile(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashBytes(f.read())
+
+
+def _strip_comments(jobj):
+    # "//..." keys are comments in task files, editing them must not invalidate results
+    if isinstance(jobj, dict):
+        return {k: _strip_comments(v) for k, v in jobj.items() if not k.startswith("//")}
+    if isinstance(jobj, list):
+        return [_strip_comments(v) for v in jobj]
+    return jobj
+
+
+def hashTaskFile(path: str) -> str:
+    """Hash of the task file independent of formatting, key order and comments"""
+    with open(path, "r") as f:
+        jobj = json.load(f)
+    normalized = json.dumps(_strip_comments(jobj), sort_keys=True, separators=(",", ":"))
+    return hashBytes(normalized.encode("utf-8"))
+
+
+class ResultCache:
+    """
+    Results of earlier runs keyed by the input content, the task and the
+    output path. An entry holds the hash of the output written for it (None
+    when no record was modified) so a deleted or edited output is rebuilt.
+    Least recently used entries are dropped beyond capacity when saved.
+    """
+    path: str
+    capacity: int
+    entries: dict[str, dict]
+
+    def __init__(self, path: str, capacity: int = DEFAULT_CACHE_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        self.entries = {}
+
+    @classmethod
+    def load(cls, path: str, capacity: int = DEFAULT_CACHE_CAPACITY) -> "ResultCache":
+        cache = cls(path, capacity)
+        try:
+            with open(path, "r") as f:
+                jobj = json.load(f)
+        except (OSError, ValueError):
+            return cache
+        if jobj.get("version") == CACHE_VERSION:
+            cache.entries = jobj.get("entries", {})
+        return cache
+
+    def save(self):
+        if len(self.entries) > self.capacity:
+            kept = sorted(self.entries.items(), key=lambda kv: kv[1]["used"], reverse=True)[:self.capacity]
+            self.entries = dict(kept)
+        # written aside and swapped so an interrupted run keeps the previous cache
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": CACHE_VERSION, "entries": self.entries}, f)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def makeKey(input_hash: str, task_hash: str, output_path: str, options: str = "") -> str:
+        return hashBytes("\0".join((input_hash, task_hash, output_path, options)).encode("utf-8"))
+
+    def lookup(self, key: str) -> bool:
+        """True when the result stored for key is still on disk unchanged"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return False
+        if entry["output"] is not None:
+            try:
+                if hashFile(entry["output"]) != entry["hash"]:
+                    return False
+            except OSError:
+                return False
+        entry["used"] = time.time()
+        return True
+
+    def store(self, key: str, output_path: str|None):
+        self.entries[key] = {
+            "output": output_path,
+            "hash": hashFile(output_path) if output_path is not None else None,
+            "used": time.time()
+        }
+
+    def discard(self, key: str):
+        self.entries.pop(key, None)
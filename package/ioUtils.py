@@ -2,6 +2,11 @@ from __future__ import annotations
 import struct
 from typing import Any, List, Tuple
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # Little Endian
 
 def read_int8(file) -> int:
@@ -85,8 +90,9 @@ inf = float("inf")
 ninf = float("-inf")
 nan = float("nan")
 def read_PgHalf(file) -> float:
-    pghalf = read_uint16(file)
-    
+    return decode_PgHalf(read_uint16(file))
+
+def _decode_PgHalf_bits(pghalf: int) -> float:
     sign = pghalf & signMask
     expo = pghalf & expoMask
     mant = pghalf & mantMask
@@ -113,10 +119,9 @@ def read_PgHalf(file) -> float:
     
     return fl
 
-def write_PgHalf(file, value: float) -> None:
+def encode_PgHalf(value: float) -> int:
 	if value == 0.0:
-		write_uInt16(file, 0)
-		return
+		return 0
 	flBytes = struct.unpack("I", struct.pack("f", value))[0]
 
 	if value == inf:
@@ -141,7 +146,147 @@ def write_PgHalf(file, value: float) -> None:
 	
 	pghalf = sign | expo | mant
 	
-	write_uInt16(file, pghalf)
+	return pghalf
+
+def write_PgHalf(file, value: float) -> None:
+	write_uInt16(file, encode_PgHalf(value))
+
+
+# PgHalf array codec, a 65,536-entry table is built on first use; NumPy arrays
+# are handled vectorized, any other iterable goes through the table / scalar path.
+
+_PgHalf_table: List[float] = None
+_PgHalf_nptable = None
+
+def _build_PgHalf_table():
+    global _PgHalf_table, _PgHalf_nptable
+    if np is None:
+        _PgHalf_table = [_decode_PgHalf_bits(pghalf) for pghalf in range(0x10000)]
+        return
+
+    pghalf = np.arange(0x10000, dtype=np.uint32)
+    sign = (pghalf & signMask) << 16
+    expo = (pghalf & expoMask) >> 9
+    mant = pghalf & mantMask
+    flBytes = sign | ((expo - 47 + 127) << 23) | (mant << 14)
+    table = flBytes.astype(np.uint32).view(np.float32).astype(np.float64)
+    table[(expo == 0) & (mant == 0)] = 0.0
+    table[(expo == 63) & (mant != 0)] = nan
+    table[(expo == 63) & (mant == 0) & (sign != 0)] = ninf
+    table[(expo == 63) & (mant == 0) & (sign == 0)] = inf
+    _PgHalf_nptable = table
+    _PgHalf_table = table.tolist()
+
+def decode_PgHalf(pghalf: int) -> float:
+    if _PgHalf_table is None:
+        _build_PgHalf_table()
+    return _PgHalf_table[pghalf]
+
+def decode_PgHalf_array(pghalfs):
+    """
+    Decode a sequence of uint16 PgHalf codes, returns a float64 ndarray for
+    NumPy input and a list of floats otherwise.
+    """
+    if _PgHalf_table is None:
+        _build_PgHalf_table()
+    if np is not None and isinstance(pghalfs, np.ndarray):
+        return _PgHalf_nptable[pghalfs.astype(np.uint16, copy=False)]
+    table = _PgHalf_table
+    return [table[pghalf] for pghalf in pghalfs]
+
+def encode_PgHalf_array(values):
+    """
+    Encode a sequence of floats as PgHalf codes, bit-identical to
+    encode_PgHalf. Returns a uint16 ndarray for NumPy input and a list of
+    ints otherwise; values not representable as uint16 raise struct.error
+    like write_PgHalf does.
+    """
+    if np is None or not isinstance(values, np.ndarray):
+        pghalfs = [encode_PgHalf(value) for value in values]
+        if any(pghalf < 0 or pghalf > 0xffff for pghalf in pghalfs):
+            raise struct.error("PgHalf code out of range")
+        return pghalfs
+
+    values = values.astype(np.float64, copy=False)
+    with np.errstate(over="ignore"):
+        fl = values.astype(np.float32)
+    if np.any(np.isinf(fl) & np.isfinite(values)):
+        raise struct.error("float too large to pack with f format")
+    flBytes = fl.view(np.uint32).astype(np.int64)
+
+    sign = (flBytes & 0x80000000) >> 16
+    expo = (((flBytes & 0x7f800000) >> 23) - 127 + 47) << 9
+    mant = (flBytes & 0x007fffff) >> 14
+    pghalfs = sign | expo | mant
+    pghalfs[values == inf] = 0x7e00
+    pghalfs[values == ninf] = 0x8000 | 0x7e00
+    pghalfs[values == 0.0] = 0
+    if np.any((pghalfs < 0) | (pghalfs > 0xffff)):
+        raise struct.error("PgHalf code out of range")
+    return pghalfs.astype(np.uint16)
+
+
+# Rounding to the header precision of quantized payloads, the results are
+# exactly representable so they survive write / read unchanged.
+
+def _step_PgHalf(pghalf: int, direction: int) -> int:
+    # neighbouring code towards -inf (direction < 0) or +inf
+    value = decode_PgHalf(pghalf)
+    if value == 0.0:
+        return 0x8001 if direction < 0 else 0x0001
+    if (value > 0.0) == (direction < 0):
+        return pghalf - 1
+    return pghalf + 1
+
+def _nearest_PgHalf(value: float) -> int:
+    if abs(value) < decode_PgHalf(0x0001):
+        return 0
+    # encode_PgHalf lets a too large exponent run into the sign bit
+    if not abs(value) <= decode_PgHalf(0x7dff):
+        raise struct.error(f"{value} out of PgHalf range")
+    return encode_PgHalf(value)
+
+def _finite_PgHalf(pghalf: int, value: float) -> float:
+    fl = decode_PgHalf(pghalf)
+    if fl in (inf, ninf):
+        raise struct.error(f"{value} out of PgHalf range")
+    return fl
+
+def floor_PgHalf(value: float) -> float:
+    """Largest PgHalf value <= value"""
+    if value > decode_PgHalf(0x7dff):
+        return decode_PgHalf(0x7dff)
+    pghalf = _nearest_PgHalf(value)
+    while decode_PgHalf(pghalf) > value:
+        pghalf = _step_PgHalf(pghalf, -1)
+    return _finite_PgHalf(pghalf, value)
+
+def ceil_PgHalf(value: float) -> float:
+    """Smallest PgHalf value >= value"""
+    if value < decode_PgHalf(0xfdff):
+        return decode_PgHalf(0xfdff)
+    pghalf = _nearest_PgHalf(value)
+    while decode_PgHalf(pghalf) < value:
+        pghalf = _step_PgHalf(pghalf, 1)
+    return _finite_PgHalf(pghalf, value)
+
+def _step_float32(value: float, direction: int) -> float:
+    if value == 0.0:
+        flBytes = 0x80000001 if direction < 0 else 0x00000001
+    else:
+        flBytes = struct.unpack("<I", struct.pack("<f", value))[0]
+        flBytes += -1 if (value > 0.0) == (direction < 0) else 1
+    return struct.unpack("<f", struct.pack("<I", flBytes))[0]
+
+def floor_float32(value: float) -> float:
+    """Largest float32 value <= value"""
+    fl = struct.unpack("<f", struct.pack("<f", value))[0]
+    return _step_float32(fl, -1) if fl > value else fl
+
+def ceil_float32(value: float) -> float:
+    """Smallest float32 value >= value"""
+    fl = struct.unpack("<f", struct.pack("<f", value))[0]
+    return _step_float32(fl, 1) if fl < value else fl
 
 
 def to_uint(bs):
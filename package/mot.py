@@ -1,34 +1,330 @@
 from __future__ import annotations
-from typing import List
-from .motUtils import Spline, alignTo4
+from typing import Iterable, List
+from array import array
+from .motUtils import Spline, SplineTrack, alignTo4, hermite, requantizeChannel, sampleTrack, sampleTracks, sampleValues, toArray
 from .ioUtils import *
+from . import profiler
 from io import BufferedReader
+from itertools import accumulate, chain
+import struct
+
+try:
+	import numpy as np
+except ImportError:
+	np = None	# pure-python fallback
+
+# Precompiled layouts, offsets are absolute in the .mot buffer
+_headerStruct = struct.Struct("<IIHhIII20s")
+_recordStruct = struct.Struct("<hbbhHI")
+_recordValueStruct = struct.Struct("<8xf")
+_recordConstStruct = struct.Struct("<hbbhHf")
+_interpol2Struct = struct.Struct("<ff")
+_interpol3Struct = struct.Struct("<HH")
+_splineStruct = struct.Struct("<H2xfff")
+_interpol5Struct = struct.Struct("<6f")
+_interpol5KeyStruct = struct.Struct("<4H")
+_interpol6Struct = struct.Struct("<6H")
+_interpol6KeyStruct = struct.Struct("<4B")
+_interpol8KeyStruct = struct.Struct(">HBBB")
+
+if np is not None:
+	_splineKeyDtype = np.dtype([("frame", "<u2"), ("pad", "<u2"), ("value", "<f4"), ("m0", "<f4"), ("m1", "<f4")])
+	_interpol5KeyDtype = np.dtype([("frame", "<u2"), ("p", "<u2"), ("m0", "<u2"), ("m1", "<u2")])
+	_interpol6KeyDtype = np.dtype([("frame", "u1"), ("p", "u1"), ("m0", "u1"), ("m1", "u1")])
+	_interpol8KeyDtype = np.dtype([("frame", ">u2"), ("p", "u1"), ("m0", "u1"), ("m1", "u1")])
+else:
+	_splineKeyDtype = _interpol5KeyDtype = _interpol6KeyDtype = _interpol8KeyDtype = None
+
+HEADER_SIZE = _headerStruct.size
+RECORD_SIZE = _recordStruct.size
 
 class MotFile:
 	header: MotHeader
 	records: List[MotRecord]
+	_recordIndices: dict = None
+	_recordColumns: dict = None
+	# buffer the file was parsed from, base of the patch writer
+	_source: bytes = None
+	# payload bytes toBuffer(dedupe=True) did not write again, of the last call
+	dedupedBytes: int = 0
 
-	def fromFile(self, file: BufferedReader):
-		self.header = MotHeader()
-		self.header.fromFile(file)
-		self.records = [
-			MotRecord().fromFile(file)
-			for _ in range(self.header.recordsCount)
-		]
+	def fromFile(self, file: BufferedReader, lazy: bool = False):
+		prof = profiler.active
+		if prof is not None:
+			prof.begin("read")
+		buffer = file.read()
+		if prof is not None:
+			prof.end()
+			prof.count("bytesRead", len(buffer))
+		self.fromBuffer(buffer, lazy)
+
+	def fromBuffer(self, buffer: bytes, lazy: bool = False):
+		"""
+		Parse a whole .mot from a bytes-like object (bytes, bytearray, mmap).
+		Records are read right after the header, payloads at their record's
+		position + interpolationsOffset.
+
+		With lazy, payloads are decoded on first access of record.interpolation
+		and the buffer is kept alive by the records until then (keep an mmap
+		open accordingly); payloads never accessed are copied verbatim on write.
+		"""
+		prof = profiler.active
+		if prof is not None:
+			prof.begin("parse")
+		self.invalidateRecordIndex()
+		self._source = buffer
+		with memoryview(buffer) as view:
+			self.header = MotHeader().fromBuffer(view, 0)
+			recordsEnd = HEADER_SIZE + RECORD_SIZE * self.header.recordsCount
+			table = view[HEADER_SIZE:recordsEnd]
+			self.records = []
+			recordOffset = HEADER_SIZE
+			for fields, (value,) in zip(_recordStruct.iter_unpack(table), _recordValueStruct.iter_unpack(table)):
+				record = MotRecord().fromFields(fields, value)
+				payloadOffset = record.payloadOffset(recordOffset)
+				if lazy:
+					record.deferInterpolation(buffer, payloadOffset)
+				else:
+					record.interpolation = MotInterpolation.fromRecordAndBuffer(record, view, payloadOffset)
+				self.records.append(record)
+				recordOffset += RECORD_SIZE
+		if prof is not None:
+			prof.end()
+			prof.count("files")
+			prof.count("records", len(self.records))
 	
-	def writeToFile(self, file: BufferedReader):
-		self.header.writeToFile(file)
-		for record in self.records:
-			record.writeToFile(file)
+	def patchSource(self) -> bytearray|None:
+		source = self._source
+		if source is None or len(self.records) != self.header.recordsCount:
+			return None
+		sourceHeader = MotHeader().fromBuffer(source, 0)
+		if sourceHeader.recordsCount != len(self.records) or sourceHeader.recordsOffset != self.header.recordsOffset:
+			return None
+
+		# check the layout before touching anything
+		patches = []
+		# payload offset -> True when a record sharing it (a deduplicated source) was decoded
+		payloads = {}
+		recordOffset = HEADER_SIZE
+		for record, (_, _, interpolationType, interpolationsCount, _, interpolationsOffset) in zip(
+			self.records, _recordStruct.iter_unpack(source[HEADER_SIZE:HEADER_SIZE + RECORD_SIZE * len(self.records)])
+		):
+			if record.interpolationType != interpolationType or record.interpolationsCount != interpolationsCount:
+				return None
+			if interpolationType > 0 and record.interpolationsOffset != interpolationsOffset:
+				return None
+			interpolation = record.interpolation if record.isInterpolationLoaded() else None
+			sizeForCount = MotInterpolation.classForType(interpolationType).sizeForCount(interpolationsCount)
+			if interpolation is not None and interpolation.size() != sizeForCount:
+				return None
+			if interpolationType > 0 and sizeForCount > 0:
+				# a decoded payload packed over a shared block would change the other records too
+				payloadOffset = record.payloadOffset(recordOffset)
+				if payloadOffset in payloads and (payloads[payloadOffset] or interpolation is not None):
+					return None
+				payloads[payloadOffset] = interpolation is not None
+			patches.append((record, recordOffset, interpolation))
+			recordOffset += RECORD_SIZE
+
+		buffer = bytearray(source)
+		self.header.packInto(buffer, 0)
+		for record, recordOffset, interpolation in patches:
+			record.packInto(buffer, recordOffset)
+			if interpolation is not None and record.interpolationType > 0:
+				interpolation.packInto(buffer, record.payloadOffset(recordOffset))
+		return buffer
+
+	def getRecordIndex(self, field: str) -> dict[int, List[int]]:
+		"""
+		Positions in records grouped by the value of a record field
+		(boneIndex, propertyIndex, interpolationType, ...), built on first use.
+		Call invalidateRecordIndex after changing records or those fields.
+		"""
+		if self._recordIndices is None:
+			self._recordIndices = {}
+		index = self._recordIndices.get(field)
+		if index is None:
+			index = {}
+			for i, record in enumerate(self.records):
+				index.setdefault(getattr(record, field), []).append(i)
+			self._recordIndices[field] = index
+		return index
+
+	def getRecordColumn(self, field: str) -> np.ndarray:
+		"""
+		A record field over all records as an int64 NumPy array (NumPy only),
+		built on first use, dropped by invalidateRecordIndex like the index.
+		"""
+		if self._recordColumns is None:
+			self._recordColumns = {}
+		column = self._recordColumns.get(field)
+		if column is None:
+			column = np.fromiter((getattr(record, field) for record in self.records), np.int64, len(self.records))
+			self._recordColumns[field] = column
+		return column
+
+	def invalidateRecordIndex(self):
+		self._recordIndices = None
+		self._recordColumns = None
+
+	def sample(self, frames: Iterable[float] = None) -> object:
+		"""
+		Values of every record at frames (default: each frame of
+		header.frameCount), a records x frames NumPy array, or a list of lists
+		without NumPy. Rows are memoized per record, see MotRecord.sample.
+		"""
+		if frames is None:
+			frames = range(self.header.frameCount)
+		frames = toArray("d", frames)
+		if np is None:
+			return [list(record.sample(frames)) for record in self.records]
+
+		key = frames.tobytes()
+		samples = np.empty((len(self.records), len(frames)))
+		splineRows = []
+		for row, record in enumerate(self.records):
+			memoized = record.memoizedSamples(key)
+			if memoized is not None:
+				samples[row] = memoized
+			elif isinstance(record.interpolation, MotInterpolSplines):
+				splineRows.append(row)
+			else:
+				samples[row] = record.sample(frames)
+		# spline records not memoized yet are evaluated in one batch
+		if len(splineRows) > 0:
+			batch = sampleTracks([self.records[row].interpolation.track for row in splineRows], frames)
+			samples[splineRows] = batch
+			for row, rowSamples in zip(splineRows, batch):
+				self.records[row].memoizeSamples(key, rowSamples)
+		return samples
+
+	def writeToFile(self, file: BufferedReader, patch: bool = False, dedupe: bool = False):
+		buffer = self.toBuffer(patch, dedupe)
+		prof = profiler.active
+		if prof is not None:
+			prof.begin("write")
+		file.write(buffer)
+		if prof is not None:
+			prof.end()
+			prof.count("bytesWritten", len(buffer))
+
+	def toBuffer(self, patch: bool = False, dedupe: bool = False) -> bytearray:
+		"""
+		Serialize the whole .mot into one preallocated buffer: header, record
+		table (plus the trailing record), then payloads in record order.
+		recordsOffset, recordsCount and every interpolationsOffset are
+		recomputed from the planned layout.
+
+		With patch, a file parsed from a buffer is written as a copy of that
+		buffer with the header, the record table and the decoded payloads
+		packed over it at their original offsets; payloads never decoded stay
+		byte-identical. Falls back to the full layout when the records count,
+		a record's interpolationType / interpolationsCount / interpolationsOffset
+		or a payload size differs from the source.
+
+		With dedupe, payloads are serialized first and a payload identical to
+		an earlier one is not written again, the interpolationsOffset of its
+		record points at the earlier block; the bytes saved are kept in
+		dedupedBytes. Deduplication always plans the full layout, patch is
+		ignored.
+		"""
+		prof = profiler.active
+		if prof is not None:
+			prof.begin("serialize")
+		if patch and not dedupe:
+			buffer = self.patchSource()
+			if buffer is not None:
+				if prof is not None:
+					prof.end()
+				return buffer
+
 		trailingRecord = MotRecord()
 		trailingRecord.makeTrailingRecord()
-		trailingRecord.writeToFile(file)
-		for record in self.records:
-			if record.interpolation is None:
-				continue
-			record.interpolation.writeToFile(file)
+		records = self.records + [trailingRecord]
+
+		self.header.recordsOffset = HEADER_SIZE
+		self.header.recordsCount = len(self.records)
+
+		# plan the layout
+		payloadOffsets = []
+		payloadSizes = []
+		# with dedupe: serialized payload -> its offset, and the payload of every record (None when shared)
+		blocks = {}
+		payloads = []
+		self.dedupedBytes = 0
+		offset = HEADER_SIZE + RECORD_SIZE * len(records)
+		for i, record in enumerate(records):
+			if record.isInterpolationLoaded():
+				size = record.interpolation.size() if record.interpolation is not None else 0
+			else:
+				size = MotInterpolation.classForType(record.interpolationType).sizeForCount(record.interpolationsCount)
+			payloadOffset = offset
+			if dedupe and size > 0:
+				payload = bytes(self._payloadBytes(record, size))
+				payloadOffset = blocks.setdefault(payload, offset)
+				payloads.append(payload if payloadOffset == offset else None)
+			else:
+				payloads.append(None)
+			payloadOffsets.append(payloadOffset)
+			payloadSizes.append(size)
+			if record.interpolationType > 0:
+				record.interpolationsOffset = payloadOffset - (HEADER_SIZE + RECORD_SIZE * i)
+			if payloadOffset == offset:
+				offset += size
+			else:
+				self.dedupedBytes += size
+
+		buffer = bytearray(offset)
+		self.header.packInto(buffer, 0)
+		for i, record in enumerate(records):
+			record.packInto(buffer, HEADER_SIZE + RECORD_SIZE * i)
+			offset = payloadOffsets[i]
+			if dedupe:
+				# serialized while planning, shared payloads are already in place
+				if payloads[i] is not None:
+					buffer[offset:offset + payloadSizes[i]] = payloads[i]
+			elif not record.isInterpolationLoaded():
+				# untouched payload, copy the original bytes
+				source, sourceOffset = record.deferredInterpolation()
+				buffer[offset:offset + payloadSizes[i]] = source[sourceOffset:sourceOffset + payloadSizes[i]]
+			elif record.interpolation is not None:
+				self._packPayload(record, buffer, offset, payloadSizes[i])
+		if prof is not None:
+			prof.end()
+			if dedupe:
+				prof.count("bytesDeduplicated", self.dedupedBytes)
+		return buffer
+
+	def _packPayload(self, record: MotRecord, buffer: bytearray, offset: int, size: int):
+		prof = profiler.active
+		if prof is not None:
+			prof.begin("encode")
+		record.interpolation.packInto(buffer, offset)
+		if prof is not None:
+			prof.addType(record.interpolationType, "encode", prof.end())
+			prof.countType(record.interpolationType, "bytesEncoded", size)
+
+	def _payloadBytes(self, record: MotRecord, size: int) -> bytes|bytearray:
+		# the payload of record as it will be written, size bytes
+		if not record.isInterpolationLoaded():
+			source, sourceOffset = record.deferredInterpolation()
+			return source[sourceOffset:sourceOffset + size]
+		buffer = bytearray(size)
+		self._packPayload(record, buffer, 0, size)
+		return buffer
 
 class MotHeader:
+	__slots__ = (
+		"magic",
+		"hash",
+		"flag",
+		"frameCount",
+		"recordsOffset",
+		"recordsCount",
+		"unknown",
+		"animationName"
+	)
+
 	magic: int
 	hash: int
 	flag: int
@@ -39,14 +335,21 @@ class MotHeader:
 	animationName: str
 
 	def fromFile(self, file: BufferedReader):
-		self.magic = read_uint32(file)
-		self.hash = read_uint32(file)
-		self.flag = read_uint16(file)
-		self.frameCount = read_int16(file)
-		self.recordsOffset = read_uint32(file)
-		self.recordsCount = read_uint32(file)
-		self.unknown = read_uint32(file)
-		self.animationName = file.read(20).decode("utf-8").rstrip("\0")
+		self.fromBuffer(file.read(HEADER_SIZE), 0)
+
+	def fromBuffer(self, buffer: bytes, offset: int) -> MotHeader:
+		(
+			self.magic,
+			self.hash,
+			self.flag,
+			self.frameCount,
+			self.recordsOffset,
+			self.recordsCount,
+			self.unknown,
+			animationName
+		) = _headerStruct.unpack_from(buffer, offset)
+		self.animationName = animationName.decode("utf-8").rstrip("\0")
+		return self
 	
 	def fillDefaults(self):
 		self.magic = 0x746F6D
@@ -59,18 +362,38 @@ class MotHeader:
 		self.animationName = ""
 	
 	def writeToFile(self, file: BufferedReader):
-		write_uInt32(file, self.magic)
-		write_uInt32(file, self.hash)
-		write_uInt16(file, self.flag)
-		write_Int16(file, self.frameCount)
-		write_uInt32(file, self.recordsOffset)
-		write_uInt32(file, self.recordsCount)
-		write_uInt32(file, self.unknown)
-		animationName = self.animationName.encode("utf-8")
-		animationName += b"\0" * (20 - len(animationName))
-		file.write(animationName)
+		buffer = bytearray(HEADER_SIZE)
+		self.packInto(buffer, 0)
+		file.write(buffer)
+
+	def packInto(self, buffer: bytearray, offset: int):
+		_headerStruct.pack_into(
+			buffer,
+			offset,
+			self.magic,
+			self.hash,
+			self.flag,
+			self.frameCount,
+			self.recordsOffset,
+			self.recordsCount,
+			self.unknown,
+			self.animationName.encode("utf-8")
+		)
 
 class MotRecord:
+	__slots__ = (
+		"boneIndex",
+		"propertyIndex",
+		"interpolationType",
+		"interpolationsCount",
+		"unknown",
+		"value",
+		"interpolationsOffset",
+		"_interpolation",
+		"_deferred",
+		"_samples"
+	)
+
 	boneIndex: int
 	propertyIndex: int
 	interpolationType: int
@@ -78,23 +401,104 @@ class MotRecord:
 	unknown: int
 	value: float
 	interpolationsOffset: int
-	interpolation: MotInterpolation
+	_interpolation: MotInterpolation
+	# (buffer, payloadOffset) of a lazily loaded payload not decoded yet
+	_deferred: tuple[bytes, int]|None
+	# (frames as bytes, values) of the last sample call
+	_samples: tuple[bytes, object]|None
+
+	def __init__(self):
+		self._interpolation = None
+		self._deferred = None
+		self._samples = None
+
+	@property
+	def interpolation(self) -> MotInterpolation:
+		if self._deferred is not None:
+			buffer, payloadOffset = self._deferred
+			self._interpolation = MotInterpolation.fromRecordAndBuffer(self, buffer, payloadOffset)
+			self._deferred = None
+		return self._interpolation
+
+	@interpolation.setter
+	def interpolation(self, interpolation: MotInterpolation):
+		self._interpolation = interpolation
+		self._deferred = None
+		self._samples = None
 
 	def fromFile(self, file: BufferedReader) -> MotRecord:
-		self.boneIndex = read_int16(file)
-		self.propertyIndex = read_int8(file)
-		self.interpolationType = read_int8(file)
-		self.interpolationsCount = read_int16(file)
-		self.unknown = read_uint16(file)
+		"""Read the record at the file position and its payload, file is left after the record"""
+		buffer = file.read(RECORD_SIZE)
+		self.fromFields(_recordStruct.unpack(buffer), _recordValueStruct.unpack(buffer)[0])
+		self.interpolation = MotInterpolation.fromRecordAndFile(self, file)
+		return self
+
+	def fromFields(self, fields: tuple, value: float) -> MotRecord:
+		(
+			self.boneIndex,
+			self.propertyIndex,
+			self.interpolationType,
+			self.interpolationsCount,
+			self.unknown,
+			interpolationsOffset
+		) = fields
 
 		if self.interpolationType == 0:
-			self.value = read_float(file)
+			self.value = value
 		else:
-			self.interpolationsOffset = read_uint32(file)
-
-		self.interpolation = MotInterpolation.fromRecordAndFile(self, file)
+			self.interpolationsOffset = interpolationsOffset
 		return self
+
+	def payloadOffset(self, recordOffset: int) -> int:
+		"""Absolute payload offset of the record stored at recordOffset"""
+		if self.interpolationType > 0:
+			return recordOffset + self.interpolationsOffset
+		return recordOffset
+
+	def deferInterpolation(self, buffer: bytes, payloadOffset: int):
+		self._deferred = (buffer, payloadOffset)
+
+	def deferredInterpolation(self) -> tuple[bytes, int]:
+		return self._deferred
+
+	def isInterpolationLoaded(self) -> bool:
+		return self._deferred is None
+
+	def peekInterpolation(self) -> MotInterpolation:
+		"""Decoded payload without attaching it to a lazily loaded record, for one-pass readers"""
+		if self.isInterpolationLoaded():
+			return self.interpolation
+		buffer, payloadOffset = self.deferredInterpolation()
+		return MotInterpolation.fromRecordAndBuffer(self, buffer, payloadOffset)
 	
+	def sample(self, frames: Iterable[float]) -> object:
+		"""
+		Values at frames (NumPy array, list without NumPy), memoized for the
+		last frames asked. Call invalidateSamples after modifying the record
+		or its interpolation in place.
+		"""
+		frames = toArray("d", frames)
+		key = frames.tobytes()
+		samples = self.memoizedSamples(key)
+		if samples is None:
+			samples = self.memoizeSamples(key, self.interpolation.sample(frames))
+		return samples
+
+	def memoizedSamples(self, key: bytes) -> object:
+		"""Memoized values for the frames key (frames as array("d") bytes), or None"""
+		if self._samples is not None and self._samples[0] == key:
+			return self._samples[1]
+		return None
+
+	def memoizeSamples(self, key: bytes, samples) -> object:
+		if np is not None and isinstance(samples, np.ndarray):
+			samples.flags.writeable = False
+		self._samples = (key, samples)
+		return samples
+
+	def invalidateSamples(self):
+		self._samples = None
+
 	def makeTrailingRecord(self):
 		self.boneIndex = 32767
 		self.propertyIndex = 0
@@ -106,15 +510,25 @@ class MotRecord:
 		self.interpolation = None
 	
 	def writeToFile(self, file: BufferedReader):
-		write_Int16(file, self.boneIndex)
-		write_Int8(file, self.propertyIndex)
-		write_Int8(file, self.interpolationType)
-		write_Int16(file, self.interpolationsCount)
-		write_uInt16(file, self.unknown)
+		buffer = bytearray(RECORD_SIZE)
+		self.packInto(buffer, 0)
+		file.write(buffer)
+
+	def packInto(self, buffer: bytearray, offset: int):
 		if self.interpolationType == 0:
-			write_float(file, self.value)
+			recordStruct, lastField = _recordConstStruct, self.value
 		else:
-			write_uInt32(file, self.interpolationsOffset)
+			recordStruct, lastField = _recordStruct, self.interpolationsOffset
+		recordStruct.pack_into(
+			buffer,
+			offset,
+			self.boneIndex,
+			self.propertyIndex,
+			self.interpolationType,
+			self.interpolationsCount,
+			self.unknown,
+			lastField
+		)
 	
 	# def getBone(self) -> bpy.types.PoseBone|None:
 	def getBone(self) -> str|None:
@@ -146,190 +560,402 @@ class MotRecord:
 class MotInterpolation:
 	record: MotRecord
 	
-	def fromFile(self, file: BufferedReader):
+	def fromBuffer(self, buffer: bytes, offset: int):
 		raise NotImplementedError()
 
-	def toKeyFrames(self):
+	def fromFile(self, file: BufferedReader):
+		"""fromBuffer on the payload of self.record, file positioned right after the record"""
+		self.fromBuffer(MotInterpolation.readPayload(self.record, file), 0)
+
+	@staticmethod
+	def readPayload(record: MotRecord, file: BufferedReader) -> bytes:
+		"""Payload bytes of record, file positioned right after the record and kept there"""
+		size = MotInterpolation.classForType(record.interpolationType).sizeForCount(record.interpolationsCount)
+		if record.interpolationType <= 0 or size == 0:
+			return b""
+		pos = file.tell()
+		file.seek(pos + record.interpolationsOffset - RECORD_SIZE)
+		buffer = file.read(size)
+		file.seek(pos)
+		return buffer
+
+	def toKeyFrames(self) -> tuple[array, array]:
+		"""Frames and values of the stored keys"""
 		raise NotImplementedError()
 	
-	def getKeyframeIndices(self):
+	def getKeyframeIndices(self) -> array:
+		return self.toKeyFrames()[0]
+
+	def sample(self, frames: array) -> object:
+		"""Values at frames, a NumPy array (list without NumPy)"""
 		raise NotImplementedError()
 	
 	def writeToFile(self, file: BufferedReader):
+		buffer = bytearray(self.size())
+		self.packInto(buffer, 0)
+		file.write(buffer)
+
+	def packInto(self, buffer: bytearray, offset: int):
+		"""Write the payload at offset, buffer is zero-filled so alignment padding is implicit"""
 		raise NotImplementedError()
 	
 	def size(self) -> int:
 		raise NotImplementedError()
 
 	@staticmethod
-	def applyInterpolationToKeyFrame():
+	def applyInterpolationToKeyFrame(p0: float, m0: float, p1: float, m1: float, t: float) -> float:
+		"""Curve between two spline keys, see motUtils.hermite"""
+		return hermite(p0, m0, p1, m1, t)
+
+	def requantize(self) -> float|None:
+		"""
+		Fit the stored header and codes to the decoded values after they were
+		modified, returns the largest dequantization error, None for the
+		types that are not quantized.
+		"""
+		return None
+
+	@classmethod
+	def sizeForCount(cls, count: int) -> int:
+		"""Payload size of count keys, known without decoding the payload"""
 		raise NotImplementedError()
 
 	@staticmethod
-	def fromRecordAndFile(record: MotRecord, file: BufferedReader) -> MotInterpolation:
-		interpolation: MotInterpolation
-
-		if record.interpolationType == 0 or record.interpolationType == -1:
-			interpolation = MotInterpolConst()
-		elif record.interpolationType == 1:
-			interpolation = MotInterpolValues()
-		elif record.interpolationType == 2:
-			interpolation = MotInterpol2()
-		elif record.interpolationType == 3:
-			interpolation = MotInterpol3()
-		elif record.interpolationType == 4:
-			interpolation = MotInterpolSplines()
-		elif record.interpolationType == 5:
-			interpolation = MotInterpol5()
-		elif record.interpolationType == 6:
-			interpolation = MotInterpol6()
-		elif record.interpolationType == 7:
-			interpolation = MotInterpol7()
-		elif record.interpolationType == 8:
-			interpolation = MotInterpol8()
+	def classForType(interpolationType: int) -> type[MotInterpolation]:
+		if interpolationType == 0 or interpolationType == -1:
+			return MotInterpolConst
+		elif interpolationType == 1:
+			return MotInterpolValues
+		elif interpolationType == 2:
+			return MotInterpol2
+		elif interpolationType == 3:
+			return MotInterpol3
+		elif interpolationType == 4:
+			return MotInterpolSplines
+		elif interpolationType == 5:
+			return MotInterpol5
+		elif interpolationType == 6:
+			return MotInterpol6
+		elif interpolationType == 7:
+			return MotInterpol7
+		elif interpolationType == 8:
+			return MotInterpol8
 		else:
-			raise Exception(f"Unknown interpolation flag: {record.interpolationType}")
-		
+			raise Exception(f"Unknown interpolation flag: {interpolationType}")
+
+	@staticmethod
+	def fromRecordAndFile(record: MotRecord, file: BufferedReader) -> MotInterpolation:
+		return MotInterpolation.fromRecordAndBuffer(record, MotInterpolation.readPayload(record, file), 0)
+
+	@staticmethod
+	def fromRecordAndBuffer(record: MotRecord, buffer: bytes, payloadOffset: int) -> MotInterpolation:
+		prof = profiler.active
+		if prof is not None:
+			prof.begin("decode")
+		interpolation = MotInterpolation.classForType(record.interpolationType)()
 		interpolation.record = record
-		interpolation.fromFile(file)
+		interpolation.fromBuffer(buffer, payloadOffset)
+		if prof is not None:
+			prof.addType(record.interpolationType, "decode", prof.end())
+			prof.countType(record.interpolationType, "records")
+			prof.countType(record.interpolationType, "keys", record.interpolationsCount)
+			prof.countType(record.interpolationType, "bytesDecoded", interpolation.size())
+			prof.count("keys", record.interpolationsCount)
 
 		return interpolation
 
 class MotInterpolConst(MotInterpolation):
 	value: float
 
-	def fromFile(self, file: BufferedReader):
+	def fromBuffer(self, buffer: bytes, offset: int):
 		self.value = self.record.value
+
+	def toKeyFrames(self) -> tuple[array, array]:
+		return array("i", [0]), array("d", [self.value])
+
+	def sample(self, frames: array) -> object:
+		if np is not None:
+			return np.full(len(frames), self.value, dtype=np.float64)
+		return [self.value] * len(frames)
 	
-	def writeToFile(self, file: BufferedReader):
+	def packInto(self, buffer: bytearray, offset: int):
 		pass
 
 	def size(self) -> int:
 		return 0
 
+	@classmethod
+	def sizeForCount(cls, count: int) -> int:
+		return 0
 
-class MotInterpolValues(MotInterpolation):
-	values: List[float]
 
-	def fromFile(self, file: BufferedReader):
-		pos = file.tell()
-		file.seek(pos + self.record.interpolationsOffset - 12)
+class MotInterpolValues(MotInterpolation):
+	values: array
+	# quantized subclasses: code array type / range and header rounding
+	_codeType = None
+	_codeMax = 0
+	_headerFloor = None
+	_headerCeil = None
 
-		self.values = []
-		for _ in range(self.record.interpolationsCount):
-			self.values.append(read_float(file))
-		
-		file.seek(pos)
+	def fromBuffer(self, buffer: bytes, offset: int):
+		self.values = array("d", struct.unpack_from(f"<{self.record.interpolationsCount}f", buffer, offset))
 
-	def writeToFile(self, file: BufferedReader):
-		for value in self.values:
-			write_float(file, value)
+	def packInto(self, buffer: bytearray, offset: int):
+		struct.pack_into(f"<{len(self.values)}f", buffer, offset, *self.values)
 
 	def size(self) -> int:
-		return len(self.values) * 4
+		return self.sizeForCount(len(self.values))
+
+	@classmethod
+	def sizeForCount(cls, count: int) -> int:
+		return count * 4
+
+	def toKeyFrames(self) -> tuple[array, array]:
+		return array("i", range(len(self.values))), self.values
+
+	def sample(self, frames: array) -> object:
+		return sampleValues(self.values, frames)
+
+	def dequantizeValues(self, codes):
+		"""
+		Fill valuesQuantized/values from the codes (a NumPy array or any
+		iterable) for the quantized subclasses, requires p/dp set beforehand.
+		"""
+		if np is not None and isinstance(codes, np.ndarray):
+			self.valuesQuantized = toArray(self._codeType, codes)
+			self.values = toArray("d", self.p + self.dp * codes)
+			return
+		self.valuesQuantized = array(self._codeType, codes)
+		self.values = array("d", [
+			self.p + self.dp * quantized
+			for quantized in self.valuesQuantized
+		])
+
+	def requantize(self) -> float|None:
+		if self._codeType is None:
+			return None
+		self.p, self.dp, codes, error = requantizeChannel(
+			self.values, getattr(self, "p", 0.0), getattr(self, "dp", 0.0), getattr(self, "valuesQuantized", None),
+			self._codeMax, self._headerFloor, self._headerCeil
+		)
+		self.dequantizeValues(codes)
+		return error
 
 		
 class MotInterpol2(MotInterpolValues):
 	p: float
 	dp: float
-	valuesQuantized: List[int]
+	valuesQuantized: array
+	_codeType = "H"
+	_codeMax = 0xffff
+	_headerFloor = staticmethod(floor_float32)
+	_headerCeil = staticmethod(ceil_float32)
 
-	def fromFile(self, file: BufferedReader):
-		pos = file.tell()
-		file.seek(pos + self.record.interpolationsOffset - 12)
-
-		self.p = read_float(file)
-		self.dp = read_float(file)
-		self.valuesQuantized = [
-			read_uint16(file)
-			for _ in range(self.record.interpolationsCount)
-		]
-		self.values = [
-			self.p + self.dp * quantized
-			for quantized in self.valuesQuantized
-		]
-
-		file.seek(pos)
+	def fromBuffer(self, buffer: bytes, offset: int):
+		self.p, self.dp = _interpol2Struct.unpack_from(buffer, offset)
+		start = offset + _interpol2Struct.size
+		if np is not None:
+			self.dequantizeValues(np.frombuffer(buffer, "<u2", self.record.interpolationsCount, start))
+		else:
+			self.dequantizeValues(struct.unpack_from(f"<{self.record.interpolationsCount}H", buffer, start))
 	
-	def writeToFile(self, file: BufferedReader):
-		write_float(file, self.p)
-		write_float(file, self.dp)
-		for quantized in self.valuesQuantized:
-			write_uInt16(file, quantized)
-		# align to 4 bytes
-		byteSize = 8 + 2 * len(self.valuesQuantized)
-		endAlign = alignTo4(byteSize) - byteSize
-		for _ in range(endAlign):
-			write_uInt8(file, 0)
+	def packInto(self, buffer: bytearray, offset: int):
+		_interpol2Struct.pack_into(buffer, offset, self.p, self.dp)
+		struct.pack_into(
+			f"<{len(self.valuesQuantized)}H", buffer, offset + _interpol2Struct.size, *self.valuesQuantized
+		)
 
 	def size(self) -> int:
-		return alignTo4(8 + 2 * len(self.valuesQuantized))
+		return self.sizeForCount(len(self.valuesQuantized))
+
+	@classmethod
+	def sizeForCount(cls, count: int) -> int:
+		return alignTo4(8 + 2 * count)
 		
 class MotInterpol3(MotInterpolValues):
 	p: float
 	dp: float
-	valuesQuantized: List[int]
+	valuesQuantized: array
+	_codeType = "B"
+	_codeMax = 0xff
+	_headerFloor = staticmethod(floor_PgHalf)
+	_headerCeil = staticmethod(ceil_PgHalf)
 
-	def fromFile(self, file: BufferedReader):
-		pos = file.tell()
-		file.seek(pos + self.record.interpolationsOffset - 12)
-
-		self.p = read_PgHalf(file)
-		self.dp = read_PgHalf(file)
-		self.valuesQuantized = [
-			read_uint8(file)
-			for _ in range(self.record.interpolationsCount)
-		]
-		self.values = [
-			self.p + self.dp * quantized
-			for quantized in self.valuesQuantized
-		]
-
-		file.seek(pos)
+	def fromBuffer(self, buffer: bytes, offset: int):
+		self.p, self.dp = map(decode_PgHalf, _interpol3Struct.unpack_from(buffer, offset))
+		start = offset + _interpol3Struct.size
+		if np is not None:
+			self.dequantizeValues(np.frombuffer(buffer, "u1", self.record.interpolationsCount, start))
+		else:
+			self.dequantizeValues(buffer[start:start + self.record.interpolationsCount])
 	
-	def writeToFile(self, file: BufferedReader):
-		write_PgHalf(file, self.p)
-		write_PgHalf(file, self.dp)
-		for quantized in self.valuesQuantized:
-			write_uInt8(file, quantized)
-		# align to 4 bytes
-		byteSize = 4 + len(self.valuesQuantized)
-		endAlign = alignTo4(byteSize) - byteSize
-		for _ in range(endAlign):
-			write_uInt8(file, 0)
+	def packInto(self, buffer: bytearray, offset: int):
+		_interpol3Struct.pack_into(buffer, offset, *encode_PgHalf_array((self.p, self.dp)))
+		start = offset + _interpol3Struct.size
+		buffer[start:start + len(self.valuesQuantized)] = bytes(self.valuesQuantized)
 
 	def size(self) -> int:
-		return alignTo4(4 + len(self.valuesQuantized))
+		return self.sizeForCount(len(self.valuesQuantized))
+
+	@classmethod
+	def sizeForCount(cls, count: int) -> int:
+		return alignTo4(4 + count)
 		
 class MotInterpolSplines(MotInterpolation):
-	splines: List[Spline]
+	"""
+	Keys are kept as columns in track (and quantizedTrack for the quantized
+	subclasses), splines / quantizedSplines give list-like access to them.
+	"""
+	track: SplineTrack
+	# quantized subclasses: key layout and the array types of the stored codes
+	_keyStruct: struct.Struct = None
+	_keyDtype = None
+	_quantizedFrameType = "H"
+	_codeType = "H"
+	_codeMax = 0xffff
+	_headerFloor = None
+	_headerCeil = None
 
-	def fromFile(self, file: BufferedReader):
-		pos = file.tell()
-		file.seek(pos + self.record.interpolationsOffset - 12)
-
-		self.splines = []
-		for _ in range(self.record.interpolationsCount):
-			spline = Spline()
-			spline.frame = read_uint16(file)
-			read_uint16(file)	# dummy
-			spline.value = read_float(file)
-			spline.m0 = read_float(file)
-			spline.m1 = read_float(file)
-			self.splines.append(spline)
+	def fromBuffer(self, buffer: bytes, offset: int):
+		count = self.record.interpolationsCount
+		if np is not None:
+			keys = np.frombuffer(buffer, _splineKeyDtype, count, offset)
+			self.track = SplineTrack(
+				toArray("i", keys["frame"]), toArray("d", keys["value"]), toArray("d", keys["m0"]), toArray("d", keys["m1"])
+			)
+			return
+		end = offset + _splineStruct.size * count
+		self.track = self.trackFromKeys(list(_splineStruct.iter_unpack(buffer[offset:end])), "i", "d")
 
-		file.seek(pos)
-	
-	def writeToFile(self, file: BufferedReader):
-		for spline in self.splines:
-			write_uInt16(file, spline.frame)
-			write_uInt16(file, 0)
-			write_float(file, spline.value)
-			write_float(file, spline.m0)
-			write_float(file, spline.m1)
+	@property
+	def splines(self) -> SplineTrack:
+		return self.track
+
+	@splines.setter
+	def splines(self, splines: Iterable[Spline]):
+		self.track = splines if isinstance(splines, SplineTrack) else SplineTrack.fromSplines(splines)
+
+	@property
+	def quantizedSplines(self) -> SplineTrack:
+		return self.quantizedTrack
+
+	@quantizedSplines.setter
+	def quantizedSplines(self, splines: Iterable[Spline]):
+		if isinstance(splines, SplineTrack):
+			self.quantizedTrack = splines
+		else:
+			self.quantizedTrack = SplineTrack.fromSplines(splines, self._quantizedFrameType, self._codeType)
+
+	def packInto(self, buffer: bytearray, offset: int):
+		struct.pack_into(
+			"<" + "H2xfff" * len(self.track),
+			buffer,
+			offset,
+			*chain.from_iterable(zip(*self.track.columns()))
+		)
 
 	def size(self) -> int:
-		return len(self.splines) * 16
+		return self.sizeForCount(len(self.track))
+
+	@classmethod
+	def sizeForCount(cls, count: int) -> int:
+		return count * 16
+
+	def toKeyFrames(self) -> tuple[array, array]:
+		return self.track.frames, self.track.values
+
+	def sample(self, frames: array) -> object:
+		return sampleTrack(self.track, frames)
+
+	@staticmethod
+	def trackFromKeys(keys: List[tuple], frameType: str, valueType: str) -> SplineTrack:
+		columns = zip(*keys) if len(keys) > 0 else ((), (), (), ())
+		frames, values, m0s, m1s = columns
+		return SplineTrack(array(frameType, frames), array(valueType, values), array(valueType, m0s), array(valueType, m1s))
+
+	def unpackQuantizedKeys(self, buffer: bytes, offset: int):
+		count = self.record.interpolationsCount
+		if np is not None:
+			keys = np.frombuffer(buffer, self._keyDtype, count, offset)
+			self.quantizedTrack = SplineTrack(
+				toArray(self._quantizedFrameType, keys["frame"]),
+				toArray(self._codeType, keys["p"]),
+				toArray(self._codeType, keys["m0"]),
+				toArray(self._codeType, keys["m1"])
+			)
+		else:
+			end = offset + self._keyStruct.size * count
+			keys = list(self._keyStruct.iter_unpack(buffer[offset:end]))
+			self.quantizedTrack = self.trackFromKeys(keys, self._quantizedFrameType, self._codeType)
+		self.dequantize()
+
+	def dequantize(self):
+		"""
+		Rebuild track from quantizedTrack, requires p/dp, m0/dm0 and m1/dm1
+		set beforehand.
+		"""
+		quantized = self.quantizedTrack
+		if np is not None:
+			self.track = SplineTrack(
+				toArray("i", self.absoluteFrames(np.asarray(quantized.frames))),
+				toArray("d", self.p + self.dp * np.asarray(quantized.values)),
+				toArray("d", self.m0 + self.dm0 * np.asarray(quantized.m0s)),
+				toArray("d", self.m1 + self.dm1 * np.asarray(quantized.m1s))
+			)
+			return
+		p, dp, m0, dm0, m1, dm1 = self.p, self.dp, self.m0, self.dm0, self.m1, self.dm1
+		self.track = SplineTrack(
+			array("i", self.absoluteFrames(quantized.frames)),
+			array("d", [p + dp * cp for cp in quantized.values]),
+			array("d", [m0 + dm0 * cm0 for cm0 in quantized.m0s]),
+			array("d", [m1 + dm1 * cm1 for cm1 in quantized.m1s])
+		)
+
+	def absoluteFrames(self, frames):
+		return frames
+
+	def relativeFrames(self, frames):
+		"""Inverse of absoluteFrames, the frames as stored in quantizedTrack"""
+		return frames
+
+	def requantize(self) -> float|None:
+		if self._keyStruct is None:
+			return None
+		track = self.track
+		# channels keep their header and codes as long as they still fit, untouched tangents included
+		quantized = getattr(self, "quantizedTrack", None)
+		codes = quantized.columns()[1:] if quantized is not None else (None, None, None)
+		self.p, self.dp, values, valueError = self.requantizeChannel(track.values, "p", "dp", codes[0])
+		self.m0, self.dm0, m0s, m0Error = self.requantizeChannel(track.m0s, "m0", "dm0", codes[1])
+		self.m1, self.dm1, m1s, m1Error = self.requantizeChannel(track.m1s, "m1", "dm1", codes[2])
+		self.quantizedTrack = SplineTrack(
+			array(self._quantizedFrameType, self.relativeFrames(track.frames)),
+			toArray(self._codeType, values),
+			toArray(self._codeType, m0s),
+			toArray(self._codeType, m1s)
+		)
+		self.dequantize()
+		return max(valueError, m0Error, m1Error)
+
+	def requantizeChannel(self, values, base: str, step: str, codes) -> tuple[float, float, object, float]:
+		return requantizeChannel(
+			values, getattr(self, base, 0.0), getattr(self, step, 0.0), codes, self._codeMax, self._headerFloor, self._headerCeil
+		)
+
+	def packQuantizedKeys(self, buffer: bytearray, offset: int):
+		quantized = self.quantizedTrack
+		if np is not None:
+			keys = np.empty(len(quantized), self._keyDtype)
+			keys["frame"], keys["p"], keys["m0"], keys["m1"] = quantized.columns()
+			buffer[offset:offset + keys.nbytes] = keys.tobytes()
+			return
+		keyFormat = self._keyStruct.format
+		struct.pack_into(
+			keyFormat[0] + keyFormat[1:] * len(quantized),
+			buffer,
+			offset,
+			*chain.from_iterable(zip(*quantized.columns()))
+		)
 
 
 class MotInterpol5(MotInterpolSplines):
@@ -339,49 +965,26 @@ class MotInterpol5(MotInterpolSplines):
 	dm0: float
 	m1: float
 	dm1: float
-	quantizedSplines: List[Spline]
+	quantizedTrack: SplineTrack
+	_keyStruct = _interpol5KeyStruct
+	_keyDtype = _interpol5KeyDtype
+	_quantizedFrameType = "H"
+	_codeType = "H"
+	_codeMax = 0xffff
+	_headerFloor = staticmethod(floor_float32)
+	_headerCeil = staticmethod(ceil_float32)
 
-	def fromFile(self, file: BufferedReader):
-		pos = file.tell()
-		file.seek(pos + self.record.interpolationsOffset - 12)
-
-		self.p = read_float(file)
-		self.dp = read_float(file)
-		self.m0 = read_float(file)
-		self.dm0 = read_float(file)
-		self.m1 = read_float(file)
-		self.dm1 = read_float(file)
-		self.splines = []
-		self.quantizedSplines = []
-		for _ in range(self.record.interpolationsCount):
-			spline = Spline()
-			spline.frame = read_uint16(file)
-			cp = read_uint16(file)
-			cm0 = read_uint16(file)
-			cm1 = read_uint16(file)
-			spline.value = self.p + self.dp * cp
-			spline.m0 = self.m0 + self.dm0 * cm0
-			spline.m1 = self.m1 + self.dm1 * cm1
-			self.splines.append(spline)
-			self.quantizedSplines.append(Spline(spline.frame, cp, cm0, cm1))
-
-		file.seek(pos)
+	def fromBuffer(self, buffer: bytes, offset: int):
+		self.p, self.dp, self.m0, self.dm0, self.m1, self.dm1 = _interpol5Struct.unpack_from(buffer, offset)
+		self.unpackQuantizedKeys(buffer, offset + _interpol5Struct.size)
 	
-	def writeToFile(self, file: BufferedReader):
-		write_float(file, self.p)
-		write_float(file, self.dp)
-		write_float(file, self.m0)
-		write_float(file, self.dm0)
-		write_float(file, self.m1)
-		write_float(file, self.dm1)
-		for spline in self.quantizedSplines:
-			write_uInt16(file, spline.frame)
-			write_uInt16(file, spline.value)
-			write_uInt16(file, spline.m0)
-			write_uInt16(file, spline.m1)
+	def packInto(self, buffer: bytearray, offset: int):
+		_interpol5Struct.pack_into(buffer, offset, self.p, self.dp, self.m0, self.dm0, self.m1, self.dm1)
+		self.packQuantizedKeys(buffer, offset + _interpol5Struct.size)
 
-	def size(self) -> int:
-		return 6 * 4 + len(self.splines) * 8
+	@classmethod
+	def sizeForCount(cls, count: int) -> int:
+		return 6 * 4 + count * 8
 		
 class MotInterpol6(MotInterpolSplines):
 	p: float
@@ -390,58 +993,40 @@ class MotInterpol6(MotInterpolSplines):
 	dm0: float
 	m1: float
 	dm1: float
-	quantizedSplines: List[Spline]
+	quantizedTrack: SplineTrack
+	_keyStruct = _interpol6KeyStruct
+	_keyDtype = _interpol6KeyDtype
+	_quantizedFrameType = "B"
+	_codeType = "B"
+	_codeMax = 0xff
+	_headerFloor = staticmethod(floor_PgHalf)
+	_headerCeil = staticmethod(ceil_PgHalf)
 
-	def fromFile(self, file: BufferedReader):
-		pos = file.tell()
-		file.seek(pos + self.record.interpolationsOffset - 12)
-
-		self.p = read_PgHalf(file)
-		self.dp = read_PgHalf(file)
-		self.m0 = read_PgHalf(file)
-		self.dm0 = read_PgHalf(file)
-		self.m1 = read_PgHalf(file)
-		self.dm1 = read_PgHalf(file)
-		self.splines = []
-		self.quantizedSplines = []
-		for _ in range(self.record.interpolationsCount):
-			spline = Spline()
-			spline.frame = read_uint8(file)
-			cp = read_uint8(file)
-			cm0 = read_uint8(file)
-			cm1 = read_uint8(file)
-			spline.value = self.p + self.dp * cp
-			spline.m0 = self.m0 + self.dm0 * cm0
-			spline.m1 = self.m1 + self.dm1 * cm1
-			self.splines.append(spline)
-			self.quantizedSplines.append(Spline(spline.frame, cp, cm0, cm1))
-		
-		file.seek(pos)
+	def fromBuffer(self, buffer: bytes, offset: int):
+		self.p, self.dp, self.m0, self.dm0, self.m1, self.dm1 = map(
+			decode_PgHalf, _interpol6Struct.unpack_from(buffer, offset)
+		)
+		self.unpackQuantizedKeys(buffer, offset + _interpol6Struct.size)
 	
-	def writeToFile(self, file: BufferedReader):
-		write_PgHalf(file, self.p)
-		write_PgHalf(file, self.dp)
-		write_PgHalf(file, self.m0)
-		write_PgHalf(file, self.dm0)
-		write_PgHalf(file, self.m1)
-		write_PgHalf(file, self.dm1)
-		for spline in self.quantizedSplines:
-			write_uInt8(file, spline.frame)
-			write_uInt8(file, spline.value)
-			write_uInt8(file, spline.m0)
-			write_uInt8(file, spline.m1)
+	def packInto(self, buffer: bytearray, offset: int):
+		_interpol6Struct.pack_into(
+			buffer, offset, *encode_PgHalf_array((self.p, self.dp, self.m0, self.dm0, self.m1, self.dm1))
+		)
+		self.packQuantizedKeys(buffer, offset + _interpol6Struct.size)
 
-	def size(self) -> int:
-		return 6 * 2 + len(self.splines) * 4
+	@classmethod
+	def sizeForCount(cls, count: int) -> int:
+		return 6 * 2 + count * 4
 		
 class MotInterpol7(MotInterpol6):
-	def fromFile(self, file: BufferedReader):
-		super().fromFile(file)
+	def absoluteFrames(self, frames):
+		# frames are stored relative to the previous key
+		if np is not None and isinstance(frames, np.ndarray):
+			return np.cumsum(frames, dtype=np.int64)
+		return list(accumulate(frames))
 
-		absoluteFrame = 0
-		for spline in self.splines:
-			spline.frame += absoluteFrame
-			absoluteFrame = spline.frame
+	def relativeFrames(self, frames):
+		return [frame - previous for previous, frame in zip(chain((0,), frames), frames)]
 
 class MotInterpol8(MotInterpolSplines):
 	p: float
@@ -450,50 +1035,27 @@ class MotInterpol8(MotInterpolSplines):
 	dm0: float
 	m1: float
 	dm1: float
-	quantizedSplines: List[Spline]
+	quantizedTrack: SplineTrack
+	_keyStruct = _interpol8KeyStruct
+	_keyDtype = _interpol8KeyDtype
+	_quantizedFrameType = "H"
+	_codeType = "B"
+	_codeMax = 0xff
+	_headerFloor = staticmethod(floor_PgHalf)
+	_headerCeil = staticmethod(ceil_PgHalf)
 
-	def fromFile(self, file: BufferedReader):
-		pos = file.tell()
-		file.seek(pos + self.record.interpolationsOffset - 12)
-
-		self.p = read_PgHalf(file)
-		self.dp = read_PgHalf(file)
-		self.m0 = read_PgHalf(file)
-		self.dm0 = read_PgHalf(file)
-		self.m1 = read_PgHalf(file)
-		self.dm1 = read_PgHalf(file)
-		self.splines = []
-		self.quantizedSplines = []
-		for _ in range(self.record.interpolationsCount):
-			spline = Spline()
-			spline.frame = readBe_uint16(file)
-			cp = read_uint8(file)
-			cm0 = read_uint8(file)
-			cm1 = read_uint8(file)
-			spline.value = self.p + self.dp * cp
-			spline.m0 = self.m0 + self.dm0 * cm0
-			spline.m1 = self.m1 + self.dm1 * cm1
-			self.splines.append(spline)
-			self.quantizedSplines.append(Spline(spline.frame, cp, cm0, cm1))
-
-		file.seek(pos)
+	def fromBuffer(self, buffer: bytes, offset: int):
+		self.p, self.dp, self.m0, self.dm0, self.m1, self.dm1 = map(
+			decode_PgHalf, _interpol6Struct.unpack_from(buffer, offset)
+		)
+		self.unpackQuantizedKeys(buffer, offset + _interpol6Struct.size)
 	
-	def writeToFile(self, file: BufferedReader):
-		write_PgHalf(file, self.p)
-		write_PgHalf(file, self.dp)
-		write_PgHalf(file, self.m0)
-		write_PgHalf(file, self.dm0)
-		write_PgHalf(file, self.m1)
-		write_PgHalf(file, self.dm1)
-		for spline in self.quantizedSplines:
-			writeBe_uint16(file, spline.frame)
-			write_uInt8(file, spline.value)
-			write_uInt8(file, spline.m0)
-			write_uInt8(file, spline.m1)
-		byteSize = 12 + len(self.quantizedSplines) * 5
-		endAlign = alignTo4(byteSize) - byteSize
-		for _ in range(endAlign):
-			write_uInt8(file, 0)
+	def packInto(self, buffer: bytearray, offset: int):
+		_interpol6Struct.pack_into(
+			buffer, offset, *encode_PgHalf_array((self.p, self.dp, self.m0, self.dm0, self.m1, self.dm1))
+		)
+		self.packQuantizedKeys(buffer, offset + _interpol6Struct.size)
 
-	def size(self) -> int:
-		return alignTo4(6 * 2 + len(self.splines) * 5)
+	@classmethod
+	def sizeForCount(cls, count: int) -> int:
+		return alignTo4(6 * 2 + count * 5)
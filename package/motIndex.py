@@ -0,0 +1,189 @@
+from __future__ import annotations
+import hashlib
+import sqlite3
+from collections.abc import Callable
+from . import mot
+from . import task
+
+DEFAULT_INDEX_NAME = ".mot_index.db"
+
+# bump when the schema or the indexed values change, older databases are rebuilt
+INDEX_VERSION = 1
+
+# Schema of the index, header fields per file and record fields per record
+_headerFields = (
+	"magic",
+	"hash",
+	"flag",
+	"frameCount",
+	"recordsOffset",
+	"recordsCount",
+	"unknown",
+	"animationName"
+)
+_recordFields = (
+	"boneIndex",
+	"propertyIndex",
+	"interpolationType",
+	"interpolationsCount",
+	"unknown",
+	"value",
+	"interpolationsOffset"
+)
+
+_schema = f"""
+CREATE TABLE IF NOT EXISTS files (
+	id INTEGER PRIMARY KEY,
+	path TEXT NOT NULL UNIQUE,
+	source TEXT NOT NULL,
+	mtime INTEGER,
+	size INTEGER,
+	sha256 TEXT NOT NULL,
+	{", ".join(f"{field} {'TEXT' if field == 'animationName' else 'INTEGER'}" for field in _headerFields)}
+);
+CREATE TABLE IF NOT EXISTS records (
+	file INTEGER NOT NULL,
+	record INTEGER NOT NULL,
+	boneIndex INTEGER NOT NULL,
+	propertyIndex INTEGER NOT NULL,
+	interpolationType INTEGER NOT NULL,
+	interpolationsCount INTEGER NOT NULL,
+	unknown INTEGER NOT NULL,
+	value REAL,
+	interpolationsOffset INTEGER,
+	PRIMARY KEY (file, record)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS records_bone ON records (boneIndex, propertyIndex, interpolationType);
+CREATE INDEX IF NOT EXISTS records_type ON records (interpolationType, interpolationsCount);
+"""
+
+# task condition operators as SQL over a record column, with the condition value bound to ?
+_sqlOperators = {
+	"==": "{0} = ?",
+	"!=": "{0} != ?",
+	">=": "{0} >= ?",
+	"<=": "{0} <= ?",
+	">": "{0} > ?",
+	"<": "{0} < ?",
+	"&": "({0} & ?) != 0",
+	"|": "({0} | ?) != 0",
+	"BMSK": "({0} & ?) = ?"
+}
+
+def conditionToSql(cond: task.TaskCondition) -> tuple[str, list]:
+	"""WHERE term of a task condition and its parameters"""
+	if not -2**63 <= cond.value < 2**63:
+		raise UserWarning(f"Condition value out of the index range: {cond.value}")
+	term = _sqlOperators[cond.operator].format(f"r.{cond.field}")
+	return term, [cond.value] * term.count("?")
+
+class MotIndex:
+	"""
+	SQLite database of header and record fields of a corpus. A file is read
+	again only when its size or mtime changed and parsed again only when its
+	content (sha256) changed; payloads are never decoded. Conditions of task
+	files are answered as SQL over the record columns; a record without a
+	condition field (value of a non-constant record, interpolationsOffset of
+	a constant one) does not match.
+	"""
+	path: str
+	connection: sqlite3.Connection
+
+	def __init__(self, path: str):
+		self.path = path
+		self.connection = sqlite3.connect(path)
+		self.connection.execute("PRAGMA synchronous = NORMAL")
+		if self.connection.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+			self.connection.executescript("DROP TABLE IF EXISTS records; DROP TABLE IF EXISTS files;")
+			self.connection.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+		self.connection.executescript(_schema)
+
+	def close(self):
+		self.connection.commit()
+		self.connection.close()
+
+	def __enter__(self) -> MotIndex:
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def commit(self):
+		self.connection.commit()
+
+	def refresh(self, path: str, source: str, stat: tuple[int, int]|None, read: Callable[[], bytes]) -> tuple[int, bool]:
+		"""
+		Bring the entry of path up to date, returns (file id, True when it was
+		parsed). stat is (mtime, size) of the file, None to always compare the
+		content (archive members); source is the file on disk holding it.
+		"""
+		row = self.connection.execute("SELECT id, mtime, size, sha256 FROM files WHERE path = ?", (path,)).fetchone()
+		if row is not None and stat is not None and (row[1], row[2]) == stat:
+			return row[0], False
+
+		data = read()
+		digest = hashlib.sha256(data).hexdigest()
+		mtime, size = stat if stat is not None else (None, len(data))
+		if row is not None and row[3] == digest:
+			self.connection.execute("UPDATE files SET mtime = ?, size = ? WHERE id = ?", (mtime, size, row[0]))
+			return row[0], False
+
+		# only the header and the record table are read
+		mobj = mot.MotFile()
+		mobj.fromBuffer(data, lazy=True)
+		header = tuple(getattr(mobj.header, field) for field in _headerFields)
+		if row is None:
+			fileId = self.connection.execute(
+				f"INSERT INTO files (path, source, mtime, size, sha256, {', '.join(_headerFields)}) VALUES ({', '.join('?' * (5 + len(_headerFields)))})",
+				(path, source, mtime, size, digest) + header
+			).lastrowid
+		else:
+			fileId = row[0]
+			self.connection.execute("DELETE FROM records WHERE file = ?", (fileId,))
+			self.connection.execute(
+				f"UPDATE files SET source = ?, mtime = ?, size = ?, sha256 = ?, {', '.join(f'{field} = ?' for field in _headerFields)} WHERE id = ?",
+				(source, mtime, size, digest) + header + (fileId,)
+			)
+		self.connection.executemany(
+			f"INSERT INTO records (file, record, {', '.join(_recordFields)}) VALUES ({', '.join('?' * (2 + len(_recordFields)))})",
+			(
+				(fileId, i) + tuple(getattr(record, field, None) for field in _recordFields)
+				for i, record in enumerate(mobj.records)
+			)
+		)
+		return fileId, True
+
+	def removeMissing(self, exists: Callable[[str], bool]) -> int:
+		"""Drop the files whose source no longer exists, returns their number"""
+		missing = [fileId for fileId, source in self.connection.execute("SELECT id, source FROM files") if not exists(source)]
+		for fileId in missing:
+			self.connection.execute("DELETE FROM records WHERE file = ?", (fileId,))
+			self.connection.execute("DELETE FROM files WHERE id = ?", (fileId,))
+		return len(missing)
+
+	def match(self, plan: task.TaskPlan, fileIds: list[int]) -> dict[int, list[tuple[int, int, tuple]]]:
+		"""
+		Records of the files fileIds matching the tasks of plan, per file id a
+		list of (record, task number, values of the condition fields) in record
+		then task order, the order TaskPlan.matchFile reports them.
+		"""
+		self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS selected (id INTEGER PRIMARY KEY)")
+		self.connection.execute("DELETE FROM selected")
+		self.connection.executemany("INSERT OR IGNORE INTO selected (id) VALUES (?)", ((fileId,) for fileId in fileIds))
+
+		matches = {}
+		for taskNumber, t in enumerate(plan.tasks):
+			terms, params = [], []
+			for cond in t.conditions:
+				term, termParams = conditionToSql(cond)
+				terms.append(term)
+				params.extend(termParams)
+			columns = "".join(f", r.{cond.field}" for cond in t.conditions)
+			query = f"SELECT r.file, r.record{columns} FROM records r JOIN selected s ON s.id = r.file"
+			if len(terms) > 0:
+				query += " WHERE " + " AND ".join(terms)
+			for row in self.connection.execute(query, params):
+				matches.setdefault(row[0], []).append((row[1], taskNumber, row[2:]))
+		for found in matches.values():
+			found.sort(key=lambda match: match[:2])
+		return matches
@@ -0,0 +1,102 @@
+from __future__ import annotations
+import json
+from typing import TextIO
+from . import mot
+from . import profiler
+
+# Schema of the JSON dump, fields are written in this order
+_headerFields = (
+	"magic",
+	"hash",
+	"flag",
+	"frameCount",
+	"recordsOffset",
+	"recordsCount",
+	"unknown",
+	"animationName"
+)
+_recordFields = (
+	"boneIndex",
+	"propertyIndex",
+	"interpolationType",
+	"interpolationsCount",
+	"unknown"
+)
+_quantizedHeaderFields = ("p", "dp", "m0", "dm0", "m1", "dm1")
+_interpolationFields = {
+	mot.MotInterpolConst: ("value",),
+	mot.MotInterpolValues: ("values",),
+	mot.MotInterpol2: ("p", "dp", "valuesQuantized", "values"),
+	mot.MotInterpol3: ("p", "dp", "valuesQuantized", "values"),
+	mot.MotInterpolSplines: ("splines",),
+	mot.MotInterpol5: _quantizedHeaderFields + ("splines", "quantizedSplines"),
+	mot.MotInterpol6: _quantizedHeaderFields + ("splines", "quantizedSplines"),
+	mot.MotInterpol7: _quantizedHeaderFields + ("splines", "quantizedSplines"),
+	mot.MotInterpol8: _quantizedHeaderFields + ("splines", "quantizedSplines"),
+}
+
+def headerToDict(header: mot.MotHeader) -> dict:
+	return {field: getattr(header, field) for field in _headerFields}
+
+def interpolationToDict(interpolation: mot.MotInterpolation) -> dict:
+	obj = {}
+	for field in _interpolationFields[type(interpolation)]:
+		value = getattr(interpolation, field)
+		if field in ("splines", "quantizedSplines"):
+			value = [
+				{"frame": frame, "value": value, "m0": m0, "m1": m1}
+				for frame, value, m0, m1 in zip(*value.columns())
+			]
+		elif field in ("values", "valuesQuantized"):
+			value = list(value)
+		obj[field] = value
+	return obj
+
+def recordToDict(record: mot.MotRecord) -> dict:
+	obj = {field: getattr(record, field) for field in _recordFields}
+	if record.interpolationType == 0:
+		obj["value"] = record.value
+	else:
+		obj["interpolationsOffset"] = record.interpolationsOffset
+	interpolation = record.peekInterpolation()
+	obj["interpolation"] = interpolationToDict(interpolation) if interpolation is not None else None
+	return obj
+
+def dumpMotFile(mobj: mot.MotFile, fp: TextIO, indent: int|None = 2):
+	"""
+	Write a MotFile as JSON one record at a time, only a single record is held
+	as a dict. Payloads of lazily loaded files are decoded per record and not
+	kept. indent=None writes compact JSON.
+	"""
+	prof = profiler.active
+	if prof is not None:
+		prof.begin("dump")
+
+	if indent is None:
+		separators = (",", ":")
+		newline = ""
+		pad = ""
+	else:
+		separators = (",", ": ")
+		newline = "\n"
+		pad = " " * indent
+
+	def encode(obj, depth: int) -> str:
+		text = json.dumps(obj, indent=indent, separators=separators)
+		if indent is None:
+			return text
+		return text.replace("\n", "\n" + pad * depth)
+
+	fp.write("{" + newline)
+	fp.write(f"{pad}\"header\"{separators[1]}{encode(headerToDict(mobj.header), 1)},{newline}")
+	fp.write(f"{pad}\"records\"{separators[1]}[")
+	for i, record in enumerate(mobj.records):
+		if i > 0:
+			fp.write(",")
+		fp.write(newline + pad * 2 + encode(recordToDict(record), 2))
+	if len(mobj.records) > 0:
+		fp.write(newline + pad)
+	fp.write("]" + newline + "}")
+
+	if prof is not None:
+		prof.end()
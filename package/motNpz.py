@@ -0,0 +1,144 @@
+from __future__ import annotations
+import io
+import pathlib
+from . import mot
+from . import profiler
+
+try:
+	import numpy as np
+except ImportError:
+	np = None	# export_npz requires NumPy
+
+DEFAULT_CORPUS_NAME = "corpus"
+
+# Schema of the columnar corpus, column -> dtype
+_fileColumns = {
+	"files.hash": "<u4",
+	"files.flag": "<u2",
+	"files.frameCount": "<i2",
+	"files.unknown": "<u4"
+}
+_recordColumns = {
+	"records.boneIndex": "<i2",
+	"records.propertyIndex": "<i1",
+	"records.interpolationType": "<i1",
+	"records.interpolationsCount": "<i2",
+	"records.unknown": "<u2"
+}
+
+def fileColumns(mobj: mot.MotFile) -> dict[str, np.ndarray]:
+	"""
+	Record table and flattened keys of one MotFile. records.value is the value
+	of constant records (NaN otherwise), records.keyCount the number of keys
+	each record contributes: the keys of toKeyFrames (one for a constant), with
+	keys.m0 / keys.m1 set for the spline types only. Payloads of lazily loaded
+	files are decoded per record and not kept, like the JSON dump.
+	"""
+	prof = profiler.active
+	if prof is not None:
+		prof.begin("export")
+
+	columns = {
+		field: np.fromiter((getattr(record, field[len("records."):]) for record in mobj.records), dtype, len(mobj.records))
+		for field, dtype in _recordColumns.items()
+	}
+	columns["records.value"] = np.fromiter(
+		(record.value if record.interpolationType == 0 else np.nan for record in mobj.records), "<f4", len(mobj.records)
+	)
+
+	frames, values, m0s, m1s = [], [], [], []
+	keyCounts = np.empty(len(mobj.records), np.int64)
+	for i, record in enumerate(mobj.records):
+		interpolation = record.peekInterpolation()
+		recordFrames, recordValues = interpolation.toKeyFrames()
+		keyCounts[i] = len(recordFrames)
+		frames.append(np.asarray(recordFrames, dtype=np.int32))
+		values.append(np.asarray(recordValues, dtype=np.float64))
+		if isinstance(interpolation, mot.MotInterpolSplines):
+			m0s.append(np.asarray(interpolation.track.m0s, dtype=np.float64))
+			m1s.append(np.asarray(interpolation.track.m1s, dtype=np.float64))
+		else:
+			m0s.append(np.full(len(recordFrames), np.nan))
+			m1s.append(m0s[-1])
+	columns["records.keyCount"] = keyCounts
+
+	def join(chunks: list, dtype) -> np.ndarray:
+		return np.concatenate(chunks) if len(chunks) > 0 else np.empty(0, dtype)
+
+	columns["keys.frame"] = join(frames, np.int32)
+	columns["keys.value"] = join(values, np.float64)
+	columns["keys.m0"] = join(m0s, np.float64)
+	columns["keys.m1"] = join(m1s, np.float64)
+
+	header = mobj.header
+	for field, dtype in _fileColumns.items():
+		columns[field] = np.array([getattr(header, field[len("files."):])], dtype)
+	columns["files.animationName"] = np.array([str(header.animationName)])
+
+	if prof is not None:
+		prof.end()
+	return columns
+
+class CorpusBuilder:
+	"""
+	Joins fileColumns of many files into one corpus: files.* has a row per
+	file (files.recordOffset: its records, n + 1 offsets), records.* a row per
+	record (records.file: its file, records.keyOffset: its keys, n + 1
+	offsets) and keys.* a row per key.
+	"""
+	names: list[str]
+	chunks: list[dict[str, np.ndarray]]
+
+	def __init__(self):
+		self.names = []
+		self.chunks = []
+
+	def add(self, name: str, columns: dict[str, np.ndarray]):
+		self.names.append(name)
+		self.chunks.append(columns)
+
+	def toArrays(self) -> dict[str, np.ndarray]:
+		if len(self.chunks) == 0:
+			raise UserWarning("No file to export ...")
+		arrays = {key: np.concatenate([chunk[key] for chunk in self.chunks]) for key in self.chunks[0]}
+		recordCounts = np.fromiter((len(chunk["records.boneIndex"]) for chunk in self.chunks), np.int64, len(self.chunks))
+
+		arrays["files.name"] = np.array(self.names)
+		arrays["files.recordOffset"] = np.concatenate(([0], np.cumsum(recordCounts)))
+		arrays["records.file"] = np.repeat(np.arange(len(self.chunks), dtype=np.int32), recordCounts)
+		arrays["records.keyOffset"] = np.concatenate(([0], np.cumsum(arrays.pop("records.keyCount"))))
+		return dict(sorted(arrays.items()))
+
+def saveCorpus(arrays: dict[str, np.ndarray], path: str|pathlib.Path, npy: bool = False):
+	"""
+	Write the corpus as one compressed .npz, or with npy as a directory of
+	<column>.npy files which loadCorpus can memory-map.
+	"""
+	path = pathlib.Path(path)
+	if npy:
+		path.mkdir(parents=True, exist_ok=True)
+		for key, column in arrays.items():
+			np.save(path / f"{key}.npy", column)
+	else:
+		np.savez_compressed(path, **arrays)
+
+def corpusEntries(arrays: dict[str, np.ndarray], name: str, npy: bool = False) -> list[tuple[str, bytes]]:
+	"""saveCorpus as (name, bytes) entries for an output archive"""
+	if npy:
+		entries = []
+		for key, column in arrays.items():
+			buffer = io.BytesIO()
+			np.save(buffer, column)
+			entries.append((f"{name}/{key}.npy", buffer.getvalue()))
+		return entries
+	buffer = io.BytesIO()
+	np.savez_compressed(buffer, **arrays)
+	return [(f"{name}.npz", buffer.getvalue())]
+
+def loadCorpus(path: str|pathlib.Path, mmap: bool = True) -> dict[str, np.ndarray]:
+	"""Columns of a corpus written by saveCorpus, .npy directories are memory-mapped unless mmap is False"""
+	path = pathlib.Path(path)
+	if path.is_dir():
+		return {file.name[:-len(".npy")]: np.load(file, mmap_mode="r" if mmap else None) for file in sorted(path.glob("*.npy"))}
+	with np.load(path) as npz:
+		return {key: npz[key] for key in npz.files}
@@ -0,0 +1,260 @@
+from __future__ import annotations
+import struct
+from . import mot
+from . import profiler
+from .motUtils import SplineTrack, hermite, sampleTracks, toArray
+
+try:
+	import numpy as np
+except ImportError:
+	np = None	# optimize requires NumPy
+
+DEFAULT_TOLERANCE = 0.0
+
+# encodings tried for a track, the constant (type 0) is checked first
+_valueTypes = (1, 2, 3)
+_splineTypes = (4, 5, 6, 7, 8)
+# share of the tolerance the key fit may use, the rest is left to quantization
+_fitShares = (0.5, 0.125)
+
+def heldLength(samples: np.ndarray) -> int:
+	"""Frames up to the last change, past them every type holds the last value"""
+	changes = np.flatnonzero(samples != samples[-1])
+	return int(changes[-1]) + 2 if len(changes) > 0 else 1
+
+def fitTracks(samples: np.ndarray, lengths: np.ndarray, maxKeys: np.ndarray, tolerance: float,
+		seeds: list[object]|None = None) -> list[SplineTrack|None]:
+	"""
+	Spline keys through every row of samples (one value per frame, the first
+	lengths[row] frames) with every frame within tolerance. Keys start at
+	both ends, then each segment still off by more than tolerance gets a key
+	at its worst frame until all segments fit (keys at every frame reproduce
+	the samples). Tangents are the central differences of the samples scaled
+	to the segment lengths. The frames of all rows are refined at once, as
+	one flat array; a row needing more than maxKeys[row] keys is given up,
+	None. seeds[row] (frames, None for none) are keys from the start, the
+	stored keys of a spline track usually leave little to refine.
+	"""
+	rows = len(samples)
+	slopes = np.gradient(samples, axis=1) if samples.shape[1] > 1 else np.zeros_like(samples)
+	offsets = np.concatenate(([0], np.cumsum(lengths)))
+	rowOf = np.repeat(np.arange(rows), lengths)
+	frames = np.arange(offsets[-1]) - offsets[rowOf]
+	values, slopes = samples[rowOf, frames], slopes[rowOf, frames]
+	# the first and last frame of a row are keys, so no segment crosses rows
+	keys = np.zeros(offsets[-1], dtype=bool)
+	keys[offsets[:-1]] = True
+	keys[offsets[1:] - 1] = True
+	if seeds is not None:
+		for row, seed in enumerate(seeds):
+			if seed is not None:
+				rowFrames = np.asarray(seed, dtype=np.int64)
+				keys[offsets[row] + rowFrames[(rowFrames >= 0) & (rowFrames < lengths[row])]] = True
+	keyCounts = np.add.reduceat(keys.astype(np.int64), offsets[:-1]) if rows > 0 else np.zeros(0, np.int64)
+	failed = keyCounts > maxKeys
+
+	# frames of the segments still to refine, with the keys closing them; a segment
+	# that fits keeps its keys and tangents, only the failing ones are evaluated again
+	selected = np.flatnonzero(((lengths > 2) & ~failed)[rowOf])
+	while len(selected) > 0:
+		mask = keys[selected]
+		at = frames[selected]
+		# previous / next key of every frame, a key is both for itself
+		local = np.arange(len(selected))
+		prev = np.maximum.accumulate(np.where(mask, local, 0))
+		following = np.minimum.accumulate(np.where(mask, local, len(local) - 1)[::-1])[::-1]
+		span = (at[following] - at[prev]).astype(np.float64)
+		t = np.divide(at - at[prev], span, out=np.zeros_like(span), where=span > 0)
+		v, m = values[selected], slopes[selected]
+		error = np.abs(hermite(v[prev], m[prev] * span, v[following], m[following] * span, t) - v)
+
+		# the worst frame of every segment over tolerance becomes a key
+		segments = np.cumsum(mask) - 1
+		worst = np.maximum.reduceat(error, np.flatnonzero(mask))
+		added = selected[(error > tolerance) & (error == worst[segments])]
+		keys[added] = True
+		keyCounts += np.bincount(rowOf[added], minlength=rows)
+		failed |= keyCounts > maxKeys
+
+		pending = worst[segments] > tolerance
+		pending[1:] |= pending[:-1]
+		selected = selected[pending & ~failed[rowOf[selected]]]
+
+	tracks = []
+	for row in range(rows):
+		if failed[row]:
+			tracks.append(None)
+			continue
+		rowKeys = np.flatnonzero(keys[offsets[row]:offsets[row + 1]])
+		spans = np.diff(rowKeys).astype(np.float64)
+		rowSlopes = slopes[offsets[row] + rowKeys]
+		tracks.append(SplineTrack(
+			toArray("i", rowKeys),
+			toArray("d", values[offsets[row] + rowKeys]),
+			toArray("d", rowSlopes * np.concatenate((spans[:1], spans))),
+			toArray("d", rowSlopes * np.concatenate((spans, spans[-1:])))
+		))
+	return tracks
+
+def _stored(interpolation: mot.MotInterpolation, count: int) -> mot.MotInterpolation:
+	# the payload as written and read back, so the error covers the float32 / PgHalf rounding
+	buffer = bytearray(interpolation.size())
+	interpolation.packInto(buffer, 0)
+	probe = mot.MotRecord()
+	probe.interpolationsCount = count
+	stored = type(interpolation)()
+	stored.record = probe
+	stored.fromBuffer(buffer, 0)
+	return stored
+
+def _fitsFrames(interpolationType: int, frames: np.ndarray) -> bool:
+	if interpolationType == 6:
+		return int(frames[-1]) <= 0xff
+	if interpolationType == 7:
+		return int(frames[0]) <= 0xff and (len(frames) < 2 or int(np.diff(frames).max()) <= 0xff)
+	return int(frames[-1]) <= 0xffff
+
+def trackCandidates(held: np.ndarray, tracks: list[SplineTrack], limit: int) -> list[tuple[int, int, mot.MotInterpolation]]:
+	"""
+	Encodings of one track, held its samples up to heldLength and tracks the
+	keys fitted to them, as (type, payload size, stored interpolation) for
+	the types 1 - 8 smaller than limit bytes, their errors not checked yet.
+	"""
+	candidates = []
+	for interpolationType in _valueTypes:
+		cls = mot.MotInterpolation.classForType(interpolationType)
+		if cls.sizeForCount(len(held)) >= limit:
+			continue
+		interpolation = cls()
+		interpolation.values = toArray("d", held)
+		try:
+			interpolation.requantize()
+			stored = _stored(interpolation, len(held))
+		except struct.error:
+			# beyond the PgHalf range of types 3 / 6 / 7 / 8, the other types may still fit
+			continue
+		candidates.append((interpolationType, cls.sizeForCount(len(held)), stored))
+
+	for track in tracks:
+		if len(track) < 2:
+			continue
+		frames = np.asarray(track.frames)
+		for interpolationType in _splineTypes:
+			cls = mot.MotInterpolation.classForType(interpolationType)
+			if cls.sizeForCount(len(track)) >= limit or not _fitsFrames(interpolationType, frames):
+				continue
+			interpolation = cls()
+			interpolation.track = SplineTrack(*(toArray(column.typecode, column) for column in track.columns()))
+			try:
+				interpolation.requantize()
+				stored = _stored(interpolation, len(track))
+			except struct.error:
+				continue
+			candidates.append((interpolationType, cls.sizeForCount(len(track)), stored))
+	return candidates
+
+def optimizeFile(mobj: mot.MotFile, tolerance: float = DEFAULT_TOLERANCE) -> list[tuple[int, int, int, int, int, float]]:
+	"""
+	Re-encode every record of mobj with the smallest payload whose values at
+	every frame (header.frameCount and the stored keys) stay within
+	tolerance of the current ones: a constant (type 0), one value per frame
+	(types 1 - 3) or spline keys fitted to the samples (types 4 - 8). The
+	samples and the candidates of all records are evaluated in batches.
+	Returns (record, old type, new type, old size, new size, max error) of
+	the records rewritten.
+	"""
+	prof = profiler.active
+	if prof is not None:
+		prof.begin("optimize")
+
+	frameCount = max(mobj.header.frameCount, 1)
+	for record in mobj.records:
+		if record.interpolationType > 0:
+			keyFrames = record.interpolation.getKeyframeIndices()
+			if len(keyFrames) > 0:
+				frameCount = max(frameCount, int(keyFrames[-1]) + 1)
+	frames = np.arange(frameCount, dtype=np.float64)
+	reference = mobj.sample(frames)
+
+	# constants first, the other tracks get keys fitted all at once
+	constants = {}
+	fitted = []
+	for i, record in enumerate(mobj.records):
+		samples = reference[i]
+		if record.interpolationType <= 0 or not np.isfinite(samples).all():
+			continue
+		lo, hi = samples.min(), samples.max()
+		value = float(np.float32((lo + hi) / 2))
+		error = max(value - lo, hi - value)
+		if error <= tolerance:
+			constants[i] = (value, error)
+		else:
+			fitted.append(i)
+	lengths = np.fromiter((heldLength(reference[i]) for i in fitted), np.int64, len(fitted))
+	# keys of the smallest spline type (4 bytes each) beyond the current payload cannot pay off
+	maxKeys = np.fromiter(
+		((mobj.records[i].interpolation.size() - mot.MotInterpol6.sizeForCount(0)) // 4 for i in fitted), np.int64, len(fitted)
+	)
+	stored = [mobj.records[i].interpolation for i in fitted]
+	seeds = [interpolation.track.frames if isinstance(interpolation, mot.MotInterpolSplines) else None for interpolation in stored]
+	tracks = [fitTracks(reference[fitted], lengths, maxKeys, tolerance * share, seeds) for share in _fitShares]
+
+	# (record, type, size, interpolation) of every candidate, checked all at once below
+	candidates = []
+	for row, i in enumerate(fitted):
+		# the stored keys as they are, then the fitted ones (the same keys for both shares once)
+		rowTracks = [stored[row].track] if seeds[row] is not None else []
+		rowTracks += {
+			len(shareTracks[row]): shareTracks[row] for shareTracks in reversed(tracks) if shareTracks[row] is not None
+		}.values()
+		candidates.extend(
+			(i, interpolationType, size, interpolation)
+			for interpolationType, size, interpolation in trackCandidates(
+				reference[i, :lengths[row]], rowTracks, mobj.records[i].interpolation.size()
+			)
+		)
+
+	errors = np.empty(len(candidates))
+	splineRows = [row for row, candidate in enumerate(candidates) if isinstance(candidate[3], mot.MotInterpolSplines)]
+	valueRows = [row for row, candidate in enumerate(candidates) if not isinstance(candidate[3], mot.MotInterpolSplines)]
+	if len(splineRows) > 0:
+		samples = sampleTracks([candidates[row][3].track for row in splineRows], frames)
+		errors[splineRows] = np.abs(samples - reference[[candidates[row][0] for row in splineRows]]).max(axis=1)
+	if len(valueRows) > 0:
+		# one value per frame, held past the last one: a gather instead of sampling
+		samples = np.stack([
+			np.asarray(candidates[row][3].values)[np.minimum(np.arange(frameCount), len(candidates[row][3].values) - 1)]
+			for row in valueRows
+		])
+		errors[valueRows] = np.abs(samples - reference[[candidates[row][0] for row in valueRows]]).max(axis=1)
+
+	# smallest payload within tolerance per record, the lower error between equal sizes
+	best = {}
+	for (i, interpolationType, size, interpolation), error in zip(candidates, errors):
+		if error <= tolerance and (i not in best or (size, error) < best[i][1:3]):
+			best[i] = (interpolationType, size, error, interpolation)
+
+	changes = []
+	for i, record in enumerate(mobj.records):
+		oldType, oldSize = record.interpolationType, record.interpolation.size() if record.interpolationType > 0 else 0
+		if i in constants:
+			value, error = constants[i]
+			interpolation = mot.MotInterpolConst()
+			interpolation.value = value
+			record.interpolationType, record.interpolationsCount, record.value = 0, 0, value
+			newType, newSize = 0, 0
+		elif i in best:
+			newType, newSize, error, interpolation = best[i]
+			record.interpolationType, record.interpolationsCount = newType, interpolation.record.interpolationsCount
+		else:
+			continue
+		interpolation.record = record
+		record.interpolation = interpolation
+		changes.append((i, oldType, newType, oldSize, newSize, float(error)))
+		if prof is not None:
+			prof.countType(newType, "optimized")
+	mobj.invalidateRecordIndex()
+
+	if prof is not None:
+		prof.end()
+	return changes
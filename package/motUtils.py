@@ -1,8 +1,19 @@
 from __future__ import annotations
+import struct
+from array import array
+from bisect import bisect_right
 from dataclasses import dataclass
-from typing import Callable
+from itertools import chain
+from typing import Callable, Iterable
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
 
 class Spline:
+	__slots__ = ("frame", "value", "m0", "m1")
+
 	frame: int
 	value: float
 	m0: float
@@ -14,5 +25,278 @@ class Spline:
 		self.m0 = m0
 		self.m1 = m1
 
+class SplineTrack:
+	"""
+	Keys of a spline track stored as parallel frame / value / m0 / m1 arrays.
+	Indexing and iteration yield SplineRef objects, so code written against
+	a list of Spline keeps working on top of the columns.
+	"""
+	__slots__ = ("frames", "values", "m0s", "m1s")
+
+	frames: array
+	values: array
+	m0s: array
+	m1s: array
+
+	def __init__(self, frames: array, values: array, m0s: array, m1s: array):
+		self.frames = frames
+		self.values = values
+		self.m0s = m0s
+		self.m1s = m1s
+
+	@classmethod
+	def fromSplines(cls, splines: Iterable[Spline], frameType: str = "i", valueType: str = "d") -> SplineTrack:
+		splines = list(splines)
+		return cls(
+			array(frameType, [spline.frame for spline in splines]),
+			array(valueType, [spline.value for spline in splines]),
+			array(valueType, [spline.m0 for spline in splines]),
+			array(valueType, [spline.m1 for spline in splines])
+		)
+
+	def columns(self) -> tuple[array, array, array, array]:
+		return self.frames, self.values, self.m0s, self.m1s
+
+	def __len__(self) -> int:
+		return len(self.frames)
+
+	def __getitem__(self, index: int|slice) -> SplineRef|list[SplineRef]:
+		if isinstance(index, slice):
+			return [SplineRef(self, i) for i in range(*index.indices(len(self)))]
+		if index < 0:
+			index += len(self)
+		if index < 0 or index >= len(self):
+			raise IndexError("spline index out of range")
+		return SplineRef(self, index)
+
+	def __iter__(self):
+		return (SplineRef(self, i) for i in range(len(self)))
+
+class SplineRef:
+	"""One key of a SplineTrack, attribute reads and writes go to the columns"""
+	__slots__ = ("track", "index")
+
+	track: SplineTrack
+	index: int
+
+	def __init__(self, track: SplineTrack, index: int):
+		self.track = track
+		self.index = index
+
+	@property
+	def frame(self) -> int:
+		return self.track.frames[self.index]
+
+	@frame.setter
+	def frame(self, frame: int):
+		self.track.frames[self.index] = frame
+
+	@property
+	def value(self) -> float:
+		return self.track.values[self.index]
+
+	@value.setter
+	def value(self, value: float):
+		self.track.values[self.index] = value
+
+	@property
+	def m0(self) -> float:
+		return self.track.m0s[self.index]
+
+	@m0.setter
+	def m0(self, m0: float):
+		self.track.m0s[self.index] = m0
+
+	@property
+	def m1(self) -> float:
+		return self.track.m1s[self.index]
+
+	@m1.setter
+	def m1(self, m1: float):
+		self.track.m1s[self.index] = m1
+
+	def __repr__(self) -> str:
+		return f"Spline({self.frame}, {self.value}, {self.m0}, {self.m1})"
+
+def quantizeChannel(values, codeMax: int, floorHeader: Callable[[float], float], ceilHeader: Callable[[float], float]) -> tuple[float, float, object, float]:
+	"""
+	Fit p / dp so that p + dp * code covers values with codes in [0, codeMax],
+	floorHeader / ceilHeader round to what the header field can store.
+	Returns p, dp, the codes (a NumPy array, or a list without NumPy) and the
+	largest absolute error of the dequantized values.
+	"""
+	if len(values) == 0:
+		return 0.0, 0.0, [], 0.0
+	if np is not None:
+		values = np.asarray(values, dtype=np.float64)
+		lo, hi = float(values.min()), float(values.max())
+	else:
+		lo, hi = min(values), max(values)
+	# + 0.0 turns a -0.0 bound into 0.0
+	p = floorHeader(lo) + 0.0
+	dp = ceilHeader((hi - p) / codeMax) if hi > p else 0.0
+	if np is not None:
+		if dp > 0.0:
+			codes = np.clip(np.rint((values - p) / dp), 0, codeMax).astype(np.int64)
+		else:
+			codes = np.zeros(len(values), dtype=np.int64)
+		return p, dp, codes, float(np.abs(p + dp * codes - values).max())
+	if dp > 0.0:
+		codes = [min(max(int(round((value - p) / dp)), 0), codeMax) for value in values]
+	else:
+		codes = [0] * len(values)
+	return p, dp, codes, max(abs(p + dp * code - value) for code, value in zip(codes, values))
+
+def requantizeChannel(values, p: float, dp: float, codes, codeMax: int, floorHeader: Callable[[float], float],
+		ceilHeader: Callable[[float], float]) -> tuple[float, float, object, float]:
+	"""
+	quantizeChannel for values decoded from p + dp * codes (codes None when
+	there are none) and modified since. Values all moved by one offset (+ /
+	- modifications, or none at all) keep dp and the codes, only p is
+	shifted, rounded to the nearest value the header field can store; the
+	channel is fit again only when the codes no longer fit.
+	"""
+	if codes is None or len(codes) != len(values) or len(values) == 0:
+		return quantizeChannel(values, codeMax, floorHeader, ceilHeader)
+	if np is not None:
+		values = np.asarray(values, dtype=np.float64)
+		codes = np.asarray(codes)
+		offsets = values - (p + dp * codes)
+		lo, hi, scale = float(offsets.min()), float(offsets.max()), float(np.abs(values).max())
+	else:
+		offsets = [value - (p + dp * code) for value, code in zip(values, codes)]
+		lo, hi, scale = min(offsets), max(offsets), max(abs(value) for value in values)
+	# one offset up to the float64 rounding of the modification, NaN never is
+	if not hi - lo <= 1e-12 * (1.0 + scale):
+		return quantizeChannel(values, codeMax, floorHeader, ceilHeader)
+	offset = (lo + hi) / 2
+	if offset != 0.0:
+		shifted = p + offset
+		try:
+			below, above = floorHeader(shifted), ceilHeader(shifted)
+		except struct.error:
+			return quantizeChannel(values, codeMax, floorHeader, ceilHeader)
+		p = (below if shifted - below <= above - shifted else above) + 0.0
+	if np is not None:
+		return p, dp, codes, float(np.abs(p + dp * codes - values).max())
+	return p, dp, codes, max(abs(p + dp * code - value) for code, value in zip(codes, values))
+
+def hermite(p0, m0, p1, m1, t):
+	"""
+	Cubic Hermite curve between two keys at t in [0, 1]: p0 / p1 are the key
+	values, m0 the outgoing tangent of the first key and m1 the incoming
+	tangent of the second. Works on floats and NumPy arrays alike.
+	"""
+	t2 = t * t
+	t3 = t2 * t
+	return (2 * t3 - 3 * t2 + 1) * p0 + (t3 - 2 * t2 + t) * m0 + (-2 * t3 + 3 * t2) * p1 + (t3 - t2) * m1
+
+def sampleTrack(track: SplineTrack, frames) -> object:
+	"""
+	Evaluate a spline track at frames (NumPy array out, list without NumPy).
+	Between two keys the curve runs from key.value with tangent key.m1 to
+	next.value with tangent next.m0, outside the keys it holds the first /
+	last value.
+	"""
+	count = len(track)
+	if np is not None:
+		at = np.asarray(frames, dtype=np.float64)
+		if count < 2:
+			return np.full(len(at), track.values[0] if count == 1 else np.nan)
+		keyFrames = np.asarray(track.frames, dtype=np.float64)
+		values = np.asarray(track.values, dtype=np.float64)
+		m0s = np.asarray(track.m0s, dtype=np.float64)
+		m1s = np.asarray(track.m1s, dtype=np.float64)
+		# key starting the segment of every frame, all frames at once
+		i = np.clip(np.searchsorted(keyFrames, at, side="right") - 1, 0, count - 2)
+		start = keyFrames[i]
+		span = keyFrames[i + 1] - start
+		t = np.divide(at - start, span, out=np.zeros_like(at), where=span > 0)
+		return hermite(values[i], m1s[i], values[i + 1], m0s[i + 1], np.clip(t, 0.0, 1.0))
+
+	if count < 2:
+		return [track.values[0] if count == 1 else float("nan")] * len(frames)
+	keyFrames, values, m0s, m1s = track.columns()
+	samples = []
+	for frame in frames:
+		i = min(max(bisect_right(keyFrames, frame) - 1, 0), count - 2)
+		span = keyFrames[i + 1] - keyFrames[i]
+		t = (frame - keyFrames[i]) / span if span > 0 else 0.0
+		samples.append(hermite(values[i], m1s[i], values[i + 1], m0s[i + 1], min(max(t, 0.0), 1.0)))
+	return samples
+
+def concatColumns(columns: list, total: int) -> np.ndarray:
+	"""
+	Columns (arrays or lists, total items) joined into one float64 NumPy
+	array, with a single buffer join when they are arrays of one type.
+	"""
+	typecodes = {getattr(column, "typecode", None) for column in columns}
+	if len(typecodes) == 1 and None not in typecodes:
+		return np.frombuffer(b"".join(columns), dtype=typecodes.pop()).astype(np.float64)
+	return np.fromiter(chain.from_iterable(columns), np.float64, total)
+
+def sampleTracks(tracks: list[SplineTrack], frames) -> np.ndarray:
+	"""
+	sampleTrack over many tracks at once (NumPy only), a tracks x frames
+	array. Keys of all tracks go into one array with every track shifted
+	past the previous one, so a single searchsorted finds all segments.
+	"""
+	at = np.asarray(frames, dtype=np.float64)
+	samples = np.empty((len(tracks), len(at)))
+	counts = np.fromiter((len(track) for track in tracks), np.int64, len(tracks))
+	multi = np.flatnonzero(counts >= 2)
+	for row in np.flatnonzero(counts < 2):
+		samples[row] = sampleTrack(tracks[row], at)
+	if len(multi) == 0 or len(at) == 0:
+		return samples
+
+	batch = [tracks[row] for row in multi]
+	counts = counts[multi]
+	total = int(counts.sum())
+	keyFrames, values, m0s, m1s = (
+		concatColumns([track.columns()[column] for track in batch], total) for column in range(4)
+	)
+	starts = np.cumsum(counts) - counts
+	low = min(keyFrames.min(), at.min())
+	stride = max(keyFrames.max(), at.max()) - low + 1.0
+	offsets = np.arange(len(batch)) * stride
+	shifted = keyFrames - low + np.repeat(offsets, counts)
+	query = (at - low)[None, :] + offsets[:, None]
+	i = np.searchsorted(shifted, query, side="right") - 1
+	i = np.clip(i, starts[:, None], (starts + counts - 2)[:, None])
+	start = keyFrames[i]
+	span = keyFrames[i + 1] - start
+	t = np.divide(at[None, :] - start, span, out=np.zeros_like(start), where=span > 0)
+	samples[multi] = hermite(values[i], m1s[i], values[i + 1], m0s[i + 1], np.clip(t, 0.0, 1.0))
+	return samples
+
+def sampleValues(values, frames) -> object:
+	"""
+	Evaluate one value per frame (values[i] at frame i) at frames, linear
+	between whole frames and holding the first / last value outside.
+	"""
+	count = len(values)
+	if np is not None:
+		at = np.asarray(frames, dtype=np.float64)
+		if count == 0:
+			return np.full(len(at), np.nan)
+		return np.interp(at, np.arange(count, dtype=np.float64), np.asarray(values, dtype=np.float64))
+
+	if count == 0:
+		return [float("nan")] * len(frames)
+	samples = []
+	for frame in frames:
+		frame = min(max(frame, 0), count - 1)
+		i = min(int(frame), count - 2) if count > 1 else 0
+		t = frame - i
+		samples.append(values[i] + (values[i + 1] - values[i]) * t if t > 0 else values[i])
+	return samples
+
+def toArray(typecode: str, values) -> array:
+	"""array of typecode from a NumPy array (one buffer copy) or any iterable"""
+	if np is not None and isinstance(values, np.ndarray):
+		return array(typecode, values.astype(typecode, copy=False).tobytes())
+	return array(typecode, values)
+
 def alignTo4(num: int) -> int:
 	return (num + 3) & ~3
@@ -0,0 +1,124 @@
+import json
+import time
+
+# the profiler hooks in mot / task / motJson report to, None (the default) disables them;
+# hooks read it once per call: `prof = profiler.active` then `if prof is not None: ...`
+active: "Profiler|None" = None
+
+REPORT_VERSION = 1
+
+
+class Profiler:
+    """
+    Timings and counters of one run. Phases nest (parse -> decode, task ->
+    decode -> requantize, ...), the time of a phase excludes the phases
+    opened inside it so the phases add up to the profiled time. Decoding,
+    encoding and requantizing are also kept per interpolation type.
+    """
+    # phase -> [nanoseconds, calls]
+    phases: dict[str, list[int]]
+    # interpolation type -> {"phases": {phase: [nanoseconds, calls]}, "counters": {name: n}}
+    types: dict[int, dict]
+    counters: dict[str, int]
+
+    def __init__(self):
+        self.phases = {}
+        self.types = {}
+        self.counters = {}
+        # open phases: [phase, start, nanoseconds spent in nested phases]
+        self._stack = []
+
+    def begin(self, phase: str):
+        self._stack.append([phase, time.perf_counter_ns(), 0])
+
+    def end(self) -> int:
+        """Close the innermost phase, returns its time without nested phases"""
+        phase, start, nested = self._stack.pop()
+        elapsed = time.perf_counter_ns() - start
+        if self._stack:
+            self._stack[-1][2] += elapsed
+        own = elapsed - nested
+        entry = self.phases.get(phase)
+        if entry is None:
+            self.phases[phase] = [own, 1]
+        else:
+            entry[0] += own
+            entry[1] += 1
+        return own
+
+    def unwind(self):
+        """Close the phases left open by an exception"""
+        while self._stack:
+            self.end()
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def _type(self, interpolationType: int) -> dict:
+        entry = self.types.get(interpolationType)
+        if entry is None:
+            entry = self.types[interpolationType] = {"phases": {}, "counters": {}}
+        return entry
+
+    def addType(self, interpolationType: int, phase: str, nanoseconds: int):
+        phases = self._type(interpolationType)["phases"]
+        entry = phases.get(phase)
+        if entry is None:
+            phases[phase] = [nanoseconds, 1]
+        else:
+            entry[0] += nanoseconds
+            entry[1] += 1
+
+    def countType(self, interpolationType: int, name: str, n: int = 1):
+        counters = self._type(interpolationType)["counters"]
+        counters[name] = counters.get(name, 0) + n
+
+    def toJson(self) -> dict:
+        return {
+            "version": REPORT_VERSION,
+            "phases": {k: {"seconds": ns / 1e9, "calls": calls} for k, (ns, calls) in sorted(self.phases.items())},
+            "types": {
+                str(t): {
+                    "phases": {k: {"seconds": ns / 1e9, "calls": calls} for k, (ns, calls) in sorted(entry["phases"].items())},
+                    "counters": dict(sorted(entry["counters"].items()))
+                }
+                for t, entry in sorted(self.types.items())
+            },
+            "counters": dict(sorted(self.counters.items()))
+        }
+
+    def merge(self, jobj: dict):
+        """Add a report of toJson (a file profiled in a worker process)"""
+        for k, v in jobj["phases"].items():
+            entry = self.phases.setdefault(k, [0, 0])
+            entry[0] += round(v["seconds"] * 1e9)
+            entry[1] += v["calls"]
+        for t, tobj in jobj["types"].items():
+            for k, v in tobj["phases"].items():
+                entry = self._type(int(t))["phases"].setdefault(k, [0, 0])
+                entry[0] += round(v["seconds"] * 1e9)
+                entry[1] += v["calls"]
+            for k, n in tobj["counters"].items():
+                self.countType(int(t), k, n)
+        for k, n in jobj["counters"].items():
+            self.count(k, n)
+
+    def save(self, path: str, wallSeconds: float):
+        jobj = self.toJson()
+        jobj["wallSeconds"] = wallSeconds
+        with open(path, "w") as f:
+            json.dump(jobj, f, indent=2)
+
+    def summary(self, wallSeconds: float) -> str:
+        total = sum(ns for ns, _ in self.phases.values())
+        lines = [f"> Profile: {total / 1e9:.3f}s in phases (summed over files), {wallSeconds:.3f}s wall"]
+        for phase, (ns, calls) in sorted(self.phases.items(), key=lambda kv: kv[1][0], reverse=True):
+            share = ns / total * 100 if total > 0 else 0
+            lines.append(f"  {phase:<12}{ns / 1e9:>10.4f}s {share:>5.1f}% {calls:>9} call(s)")
+        for t, entry in sorted(self.types.items()):
+            timings = ", ".join(f"{phase} {ns / 1e9:.4f}s" for phase, (ns, _) in sorted(entry["phases"].items()))
+            counters = ", ".join(f"{name} {n}" for name, n in sorted(entry["counters"].items()))
+            lines.append(f"  type {t}: {timings}{'; ' if timings and counters else ''}{counters}")
+        if self.counters:
+            lines.append("  " + ", ".join(f"{name} {n}" for name, n in sorted(self.counters.items())))
+        return "\n".join(lines)
@@ -2,6 +2,13 @@ import sys
 from collections.abc import Callable
 
 from . import mot
+from . import profiler
+from .motUtils import concatColumns, toArray
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 _task_cond_op = {
     "==": lambda a, b: a == b,
@@ -15,6 +22,13 @@ _task_cond_op = {
     "BMSK": lambda a, b: (a & b) == b 
 }
 
+# the same operators over a NumPy column of record fields, giving a boolean mask
+_task_cond_mask_op = {
+    **_task_cond_op,
+    "&":  lambda a, b: (a & b) != 0,
+    "|":  lambda a, b: (a | b) != 0
+}
+
 _record_modifier_op = {
     "+":  lambda a, b: a + b,
     '-':  lambda a, b: a - b,
@@ -79,6 +93,65 @@ _record_modifier = {
     8: _TypeInterpol8
 }
 
+# Array versions of the modifiers above: one ufunc call over the values of all
+# records a task matched. float64 ufuncs give the same results as the Python
+# float operators, only division by zero has to be raised explicitly.
+if np is not None:
+    _array_modifier_op = {
+        "+":  np.add,
+        "-":  np.subtract,
+        "*":  np.multiply,
+        "/":  np.true_divide,
+        "//": np.floor_divide,
+        "=":  lambda a, b: np.full(len(a), b, dtype=np.float64)
+    }
+else:
+    _array_modifier_op = {}
+
+_zero_division_message = {
+    "/":  "float division by zero",
+    "//": "float floor division by zero"
+}
+
+def _interpolation_field(name: str) -> tuple[Callable, Callable]:
+    return (lambda rec: getattr(rec.interpolation, name), lambda rec, v: setattr(rec.interpolation, name, v))
+
+_record_value_field = (lambda rec: rec.value, lambda rec, v: setattr(rec, "value", v))
+_track_values_field = (lambda rec: rec.interpolation.track.values, lambda rec, v: setattr(rec.interpolation.track, "values", v))
+
+_array_modifier_fields = {
+    # type: (per-record fields, value columns) in the order the modifiers above change them
+    0: ((_interpolation_field("value"), _record_value_field), ()),
+    1: ((), (_interpolation_field("values"),)),
+    2: ((_interpolation_field("p"),), (_interpolation_field("values"),)),
+    3: ((_interpolation_field("p"),), (_interpolation_field("values"),)),
+    4: ((), (_track_values_field,)),
+    5: ((_interpolation_field("p"),), (_track_values_field,)),
+    6: ((_interpolation_field("p"),), (_track_values_field,)),
+    7: ((_interpolation_field("p"),), (_track_values_field,)),
+    8: ((_interpolation_field("p"),), (_track_values_field,))
+}
+
+def _array_op(m: "TaskModification", values: "np.ndarray") -> "np.ndarray":
+    if len(values) > 0 and m.operator in _zero_division_message and m.value == 0:
+        raise ZeroDivisionError(_zero_division_message[m.operator])
+    return _array_modifier_op[m.operator](values, m.value)
+
+def _array_modify(m: "TaskModification", rtype: int, records: list[mot.MotRecord]):
+    scalars, columns = _array_modifier_fields[rtype]
+    # one value per record, the Python operator keeps its exact result type
+    for get, set in scalars:
+        for rec in records:
+            set(rec, m.op(get(rec), m.value))
+    for get, set in columns:
+        parts = [get(rec) for rec in records]
+        counts = [len(part) for part in parts]
+        results = _array_op(m, concatColumns(parts, sum(counts)))
+        start = 0
+        for rec, count in zip(records, counts):
+            set(rec, toArray("d", results[start:start + count]))
+            start += count
+
 def _util_conv_int(v: int|str) -> int:
     if type(v) == int:
         return v
@@ -94,87 +167,321 @@ def _util_conv_int(v: int|str) -> int:
     return int(v) # guess is decimal
 
 
-def _task_op_conditon(t, it: tuple[int, mot.MotRecord], callback: Callable = None) -> bool:
-    cond_expected = True
-    condition_strings = []
-    for cond in t['conditions']:
+_task_cond_fields = (
+    "boneIndex",
+    "propertyIndex",
+    "interpolationType",
+    "interpolationsCount",
+    "unknown",
+    "value",
+    "interpolationsOffset"
+)
+
+# fields every record carries, conditions on them never fail to fetch
+_task_indexed_fields = (
+    "boneIndex",
+    "propertyIndex",
+    "interpolationType",
+    "interpolationsCount",
+    "unknown"
+)
+
+_field_repr = {
+    "_default": lambda v: f"{v}",
+    "boneIndex": lambda v: f"{v} ({v:0x})"
+}
+
+
+class TaskCondition:
+    field: str
+    operator: str
+    op: Callable
+    value: int
+
+    def __init__(self, cond: dict):
         if cond['operator'] not in _task_cond_op:
             raise UserWarning(f"Unsupported condition operator: {cond['operator']}")
-        if cond['field'] not in it[1].__dict__:
+        if cond['field'] not in _task_cond_fields:
             raise UserWarning(f"Unsupported condition field: {cond['field']}")
 
-        cond_op = _task_cond_op[cond['operator']]
-        a = it[1].__dict__[cond['field']]
-        b = _util_conv_int(cond['value'])
-        if cond_expected != cond_op(a, b):
+        self.field = cond['field']
+        self.operator = cond['operator']
+        self.op = _task_cond_op[self.operator]
+        self.value = _util_conv_int(cond['value'])
+
+    def fetch(self, rec: mot.MotRecord):
+        try:
+            return getattr(rec, self.field)
+        except AttributeError:
+            raise UserWarning(f"Unsupported condition field: {self.field}") from None
+
+    def describe(self, a) -> str:
+        field_repr = _field_repr.get(self.field, _field_repr['_default'])
+        return f"\tfield:[{self.field}: {field_repr(a)}] operator:[{self.operator}] value:[{self.value}]"
+
+
+class TaskModification:
+    operator: str
+    op: Callable
+    value: float
+
+    def __init__(self, m: dict):
+        if m['operator'] not in _record_modifier_op:
+            raise UserWarning(f"Unsupported operator for modifying: {m['operator']}")
+
+        self.operator = m['operator']
+        self.op = _record_modifier_op[self.operator]
+        self.value = m['value']
+
+
+class Task:
+    description: str
+    conditions: list[TaskCondition]
+    modifications: list[TaskModification]
+    indexed: list[TaskCondition]
+    columnar: list[TaskCondition]
+
+    def __init__(self, t: dict):
+        self.description = t.get('description', "")
+        self.conditions = [TaskCondition(cond) for cond in t.get('conditions', [])]
+        self.modifications = [TaskModification(m) for m in t.get('modifications', [])]
+
+        # leading conditions on fields every record carries: with NumPy they are evaluated
+        # as one mask over the file (columnar), otherwise the equality ones look records up
+        # through MotFile.getRecordIndex (indexed). Both stop at the first field which may be
+        # missing so its error is not masked.
+        self.indexed = []
+        self.columnar = []
+        contiguous = True
+        for cond in self.conditions:
+            if cond.field not in _task_indexed_fields:
+                break
+            if cond.operator == "==":
+                self.indexed.append(cond)
+            # the mask covers a prefix of the conditions, values must fit the int64 columns
+            contiguous = contiguous and -2**63 <= cond.value < 2**63
+            if contiguous:
+                self.columnar.append(cond)
+
+    def candidates(self, mobj: mot.MotFile) -> tuple[list[int]|range|set, int]:
+        """
+        Records which may match and how many leading conditions they are known
+        to satisfy already.
+        """
+        if np is not None and len(self.columnar) > 0:
+            mask = None
+            for cond in self.columnar:
+                cond_mask = _task_cond_mask_op[cond.operator](mobj.getRecordColumn(cond.field), cond.value)
+                mask = cond_mask if mask is None else mask & cond_mask
+            return np.flatnonzero(mask).tolist(), len(self.columnar)
+
+        if len(self.indexed) == 0:
+            return range(len(mobj.records)), 0
+
+        lookups = sorted(
+            (mobj.getRecordIndex(cond.field).get(cond.value, []) for cond in self.indexed),
+            key=len
+        )
+        found = set(lookups[0])
+        for lookup in lookups[1:]:
+            found.intersection_update(lookup)
+        return found, 0
+
+
+class TaskPlan:
+    """
+    Task file compiled once: operators resolved, condition values converted and
+    unsupported fields / operators rejected before any record is visited.
+    """
+    tasks: list[Task]
+
+    def __init__(self, jobj: list[dict]):
+        self.tasks = [Task(t) for t in jobj]
+
+    @classmethod
+    def fromFile(cls, path: str) -> "TaskPlan":
+        import json
+
+        jobj = None
+        with open(path, "r") as f:
+            jobj = json.load(f)
+        if jobj is None:
+            raise RuntimeError("Task file")
+        return cls(jobj)
+
+    def _candidates(self, mobj: mot.MotFile) -> list[tuple[int, list[tuple[Task, int]]]]:
+        # records in file order with the tasks (in task order) which may match them,
+        # paired with the number of leading conditions already checked
+        by_record = {}
+        for t in self.tasks:
+            found, checked = t.candidates(mobj)
+            for i in found:
+                by_record.setdefault(i, []).append((t, checked))
+        return sorted(by_record.items())
+
+    def applyFile(self, mobj: mot.MotFile) -> bool:
+        prof = profiler.active
+        if prof is not None:
+            prof.begin("task")
+        ret = self._applyFile(mobj)
+        if prof is not None:
+            prof.end()
+        return ret
+
+    def _applyFile(self, mobj: mot.MotFile) -> bool:
+        if np is None:
+            ret = False
+            for i, tasks in self._candidates(mobj):
+                ret = self._apply(tasks, (i, mobj.records[i])) | ret
+            return ret
+
+        # task by task over all their matching records, each modification in one
+        # array operation; a record only depends on its own fields so the result
+        # is the same as record by record, messages are printed in that order
+        logs = {}
+        modified = set()
+        try:
+            for t in self.tasks:
+                matched = []
+                found, checked = t.candidates(mobj)
+                for i in sorted(found):
+                    it = (i, mobj.records[i])
+                    if not _task_op_conditon(t, it, checked=checked):
+                        continue
+                    logs.setdefault(i, []).append(f"Record[{i}] matches condition, do task modifier ...")
+                    matched.append(it)
+                _task_op_array_modifier(t, matched, logs)
+                modified.update(i for i, _ in matched)
+
+            for i in sorted(modified):
+                message = _task_op_requantize((i, mobj.records[i]))
+                if message is not None:
+                    logs[i].append(message)
+                mobj.records[i].invalidateSamples()
+        finally:
+            for i in sorted(logs):
+                print("\n".join(logs[i]), file=sys.stderr)
+        return len(modified) > 0
+
+    def matchFile(self, mobj: mot.MotFile) -> bool:
+        prof = profiler.active
+        if prof is not None:
+            prof.begin("task")
+        ret = False
+        for i, tasks in self._candidates(mobj):
+            ret = self._match(tasks, (i, mobj.records[i])) | ret
+        if prof is not None:
+            prof.end()
+        return ret
+
+    def apply(self, it: tuple[int, mot.MotRecord]) -> bool:
+        return self._apply([(t, 0) for t in self.tasks], it)
+
+    def match(self, it: tuple[int, mot.MotRecord]) -> bool:
+        return self._match([(t, 0) for t in self.tasks], it)
+
+    def _apply(self, tasks: list[tuple[Task, int]], it: tuple[int, mot.MotRecord]) -> bool:
+        ret = False
+        for t, checked in tasks:
+            # check conditions
+            if not _task_op_conditon(t, it, checked=checked):
+                continue
+            print(f"Record[{it[0]}] matches condition, do task modifier ...", file=sys.stderr)
+            ret = True
+
+            # apply modifications
+            _task_op_modifier(t, it)
+
+        # quantized payloads are refitted once, after every task touched the record
+        if ret:
+            message = _task_op_requantize(it)
+            if message is not None:
+                print(message, file=sys.stderr)
+            it[1].invalidateSamples()
+        return ret
+
+    def _match(self, tasks: list[tuple[Task, int]], it: tuple[int, mot.MotRecord]) -> bool:
+        ret = False
+        for t, checked in tasks:
+            # check conditions
+            ret = _task_op_conditon(
+                t,
+                it,
+                callback=lambda cond_str: print(f"Record[{it[0]}] matches conditions ...\n{cond_str}", file=sys.stderr),
+                checked=checked
+            ) or ret
+        return ret
+
+
+def _task_op_conditon(t: Task, it: tuple[int, mot.MotRecord], callback: Callable = None, checked: int = 0) -> bool:
+    # the first `checked` conditions are known to hold (columnar mask)
+    cond_expected = True
+    for cond in t.conditions[checked:]:
+        a = cond.fetch(it[1])
+        if cond_expected != cond.op(a, cond.value):
             return False
-        
-        if callback != None:
-            _field_repr = {
-                "_default": lambda v: f"{v}",
-                "boneIndex": lambda v: f"{v} ({v:0x})"
-            }
-            field_repr = _field_repr['_default']
-            if cond['field'] in _field_repr:
-                field_repr = _field_repr[cond['field']]
-            astr = field_repr(a)
-            condition_strings.append(f"\tfield:[{cond['field']}: {astr}] operator:[{cond['operator']}] value:[{b}]")
-    
+
     # call callable when full matching only
     if callback != None:
-        callback("\n".join(condition_strings))
+        callback("\n".join(cond.describe(cond.fetch(it[1])) for cond in t.conditions))
 
     return True
 
 
-def _task_op_modifier(t, it: tuple[int, mot.MotRecord]) -> None:
-    for m in t['modifications']:
-        if it[1].interpolationType not in _record_modifier:
+def _task_op_modifier(t: Task, it: tuple[int, mot.MotRecord]) -> None:
+    if it[1].interpolationType not in _record_modifier:
+        for _ in t.modifications:
             print(f"Unsupported interpolation type for modifying: {it[1].interpolationType}", file=sys.stderr)
+        return
+    modifier = _record_modifier[it[1].interpolationType]
+    for m in t.modifications:
+        modifier(m.op, it[1], m.value)
+
+
+def _task_op_array_modifier(t: Task, matched: list[tuple[int, mot.MotRecord]], logs: dict[int, list[str]]) -> None:
+    by_type = {}
+    for i, rec in matched:
+        if rec.interpolationType not in _record_modifier:
+            for _ in t.modifications:
+                logs[i].append(f"Unsupported interpolation type for modifying: {rec.interpolationType}")
             continue
-        if m['operator'] not in _record_modifier_op:
-            print(f"Unsupported operator for modifying: {m['operator']}", file=sys.stderr)
-            continue
-        modifier = _record_modifier[it[1].interpolationType]
-        modifier_op = _record_modifier_op[m['operator']]
-        modifier(modifier_op, it[1], m['value'])
+        by_type.setdefault(rec.interpolationType, []).append(rec)
 
+    for m in t.modifications:
+        # integers beyond 2**53 and non-numbers keep the exact Python semantics
+        batched = type(m.value) is float or (type(m.value) is int and abs(m.value) <= 2**53)
+        for rtype, records in by_type.items():
+            if batched:
+                _array_modify(m, rtype, records)
+            else:
+                for rec in records:
+                    _record_modifier[rtype](m.op, rec, m.value)
 
-def apply(path: str, it: tuple[int, mot.MotRecord]) -> bool:
-    import json
 
-    jobj = None
-    with open(path, "r") as f:
-        jobj = json.load(f)
-    if jobj is None:
-        raise RuntimeError("Task file")
+def _task_op_requantize(it: tuple[int, mot.MotRecord]) -> str|None:
+    if it[1].interpolationType not in _record_modifier:
+        return None
+    interpolation = it[1].interpolation
+    prof = profiler.active
+    if prof is not None:
+        prof.begin("requantize")
+    error = interpolation.requantize()
+    if prof is not None:
+        prof.addType(it[1].interpolationType, "requantize", prof.end())
+    if error is None:
+        return None
+    return f"Record[{it[0]}] requantized, max error: {error:g}"
 
-    ret = False
-    for t in jobj:
-        # check conditions
-        if not _task_op_conditon(t, it):
-            continue
-        print(f"Record[{it[0]}] matches condition, do task modifier ...", file=sys.stderr)
-        ret = True
-
-        # apply modifications
-        _task_op_modifier(t, it)
-    return ret
-
-
-def match(path: str, it: tuple[int, mot.MotRecord]):
-    import json
-
-    jobj = None
-    with open(path, "r") as f:
-        jobj = json.load(f)
-    if jobj is None:
-        raise RuntimeError("Task file")
-    
-    for t in jobj:
-        # check conditions
-        _task_op_conditon(
-            t, 
-            it, 
-            callback=lambda cond_str: print(f"Record[{it[0]}] matches conditions ...\n{cond_str}", file=sys.stderr)
-        )
\ No newline at end of file
+
+def load(task: str|TaskPlan) -> TaskPlan:
+    if isinstance(task, TaskPlan):
+        return task
+    return TaskPlan.fromFile(task)
+
+
+def apply(task: str|TaskPlan, it: tuple[int, mot.MotRecord]) -> bool:
+    return load(task).apply(it)
+
+
+def match(task: str|TaskPlan, it: tuple[int, mot.MotRecord]) -> bool:
+    return load(task).match(it)
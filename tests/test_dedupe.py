@@ -0,0 +1,64 @@
+"""
+Payload deduplication on write: identical payloads are written once and
+shared, the file parses back to the same values as its input, and writing
+it again without dedupe gives the plain layout back.
+"""
+import os
+import random
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+import corpus
+from package import mot
+
+
+def _parse(buffer: bytes) -> mot.MotFile:
+    mobj = mot.MotFile()
+    mobj.fromBuffer(buffer)
+    return mobj
+
+
+def _duplicated_buffer(seed: int = 0) -> bytes:
+    # every record twice, the second copies parsed from the same bytes
+    buffer = bytes(corpus.generate_mot(random.Random(seed), 45, 40, 240).toBuffer())
+    mobj = _parse(buffer)
+    mobj.records += _parse(buffer).records
+    return bytes(mobj.toBuffer())
+
+
+def _values(mobj: mot.MotFile) -> list:
+    frames = range(mobj.header.frameCount + 1)
+    return [
+        (record.interpolationType, record.interpolationsCount, list(record.sample(frames))) for record in mobj.records
+    ]
+
+
+class DedupeWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.buffer = _duplicated_buffer()
+        self.source = _parse(self.buffer)
+
+    def test_reparse_gives_the_same_values(self):
+        mobj = _parse(self.buffer)
+        output = bytes(mobj.toBuffer(dedupe=True))
+        self.assertGreater(mobj.dedupedBytes, 0)
+        self.assertEqual(len(output), len(self.buffer) - mobj.dedupedBytes)
+        self.assertEqual(_values(_parse(output)), _values(self.source))
+
+    def test_lazy_reparse_gives_the_same_values(self):
+        mobj = mot.MotFile()
+        mobj.fromBuffer(self.buffer, lazy=True)
+        output = bytes(mobj.toBuffer(dedupe=True))
+        self.assertEqual(_values(_parse(output)), _values(self.source))
+
+    def test_rewrite_without_dedupe_restores_the_layout(self):
+        deduped = bytes(_parse(self.buffer).toBuffer(dedupe=True))
+        self.assertEqual(bytes(_parse(deduped).toBuffer()), self.buffer)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+optimize action: the re-encoded file, written and parsed back, stays within
+the tolerance of the input at every frame, and is never larger.
+"""
+import math
+import os
+import random
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+import corpus
+from package import mot
+from package import motOptimize
+
+np = motOptimize.np
+TOLERANCES = (0.0, 1e-3, 1e-2)
+
+
+def _synthetic_buffer(seed: int = 0) -> bytes:
+    # random tracks of every type, plus smooth, constant and out of PgHalf range value tracks the optimizer can shrink
+    mobj = corpus.generate_mot(random.Random(seed), 90, 40, 240)
+    tracks = [
+        [math.sin(i / 7.0) for i in range(40)],
+        [0.25 * i for i in range(40)],
+        [0.5] * 40,
+        [-100000.0 + 3.7 * i for i in range(40)]
+    ]
+    values = [record for record in mobj.records if record.interpolationType == 1]
+    for record, track in zip(values, tracks):
+        record.interpolation.values = [corpus._f32(value) for value in track]
+    return bytes(mobj.toBuffer())
+
+
+def _parse(buffer: bytes, lazy: bool = False) -> mot.MotFile:
+    mobj = mot.MotFile()
+    mobj.fromBuffer(buffer, lazy=lazy)
+    return mobj
+
+
+@unittest.skipIf(np is None, "optimize requires numpy")
+class OptimizeTest(unittest.TestCase):
+    def setUp(self):
+        self.buffer = _synthetic_buffer()
+        self.source = _parse(self.buffer)
+        frameCount = max(
+            [self.source.header.frameCount]
+            + [int(record.interpolation.getKeyframeIndices()[-1]) + 1 for record in self.source.records if record.interpolationType > 0]
+        )
+        self.frames = np.arange(frameCount, dtype=np.float64)
+        self.reference = self.source.sample(self.frames)
+
+    def test_within_tolerance(self):
+        for tolerance in TOLERANCES:
+            mobj = _parse(self.buffer, lazy=True)
+            changes = motOptimize.optimizeFile(mobj, tolerance)
+            output = bytes(mobj.toBuffer())
+            optimized = _parse(output)
+
+            self.assertTrue(changes, tolerance)
+            self.assertLessEqual(len(output), len(self.buffer))
+            self.assertEqual(len(optimized.records), len(self.source.records))
+            error = np.abs(optimized.sample(self.frames) - self.reference).max(axis=1)
+            self.assertLessEqual(float(error.max()), tolerance)
+            for i, _, _, _, _, reported in changes:
+                self.assertLessEqual(reported, tolerance)
+                self.assertLessEqual(float(error[i]), reported)
+
+    def test_keeps_record_fields(self):
+        mobj = _parse(self.buffer, lazy=True)
+        motOptimize.optimizeFile(mobj, 1e-3)
+        optimized = _parse(bytes(mobj.toBuffer()))
+        self.assertEqual(
+            [(record.boneIndex, record.propertyIndex, record.unknown) for record in optimized.records],
+            [(record.boneIndex, record.propertyIndex, record.unknown) for record in self.source.records]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+Patch writer: a file written back with patch and no modifications is
+byte-identical to its source, decoded or not, and a modified record only
+changes its own payload.
+"""
+import os
+import random
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+import corpus
+from package import mot
+
+
+def _synthetic_buffer(seed: int = 0) -> bytes:
+    return bytes(corpus.generate_mot(random.Random(seed), 90, 40, 240).toBuffer())
+
+
+def _parse(buffer: bytes, lazy: bool) -> mot.MotFile:
+    mobj = mot.MotFile()
+    mobj.fromBuffer(buffer, lazy=lazy)
+    return mobj
+
+
+class PatchWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.buffer = _synthetic_buffer()
+
+    def test_unmodified_is_byte_identical(self):
+        for lazy in (True, False):
+            mobj = _parse(self.buffer, lazy)
+            self.assertIsNotNone(mobj.patchSource())
+            self.assertEqual(bytes(mobj.toBuffer(patch=True)), self.buffer, f"lazy={lazy}")
+
+    def test_decoded_payloads_are_byte_identical(self):
+        mobj = _parse(self.buffer, lazy=True)
+        for record in mobj.records:
+            record.interpolation
+        self.assertEqual(bytes(mobj.toBuffer(patch=True)), self.buffer)
+
+    def test_modified_record_changes_its_payload_only(self):
+        mobj = _parse(self.buffer, lazy=True)
+        row = next(i for i, record in enumerate(mobj.records) if record.interpolationType == 1)
+        record = mobj.records[row]
+        record.interpolation.values[0] += 1.0
+        output = bytes(mobj.toBuffer(patch=True))
+
+        self.assertEqual(len(output), len(self.buffer))
+        start = record.payloadOffset(mot.HEADER_SIZE + mot.RECORD_SIZE * row)
+        end = start + record.interpolation.size()
+        changed = [i for i, (a, b) in enumerate(zip(output, self.buffer)) if a != b]
+        self.assertTrue(changed)
+        self.assertTrue(all(start <= i < end for i in changed))
+
+
+if __name__ == "__main__":
+    unittest.main()
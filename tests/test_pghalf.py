@@ -0,0 +1,99 @@
+"""
+PgHalf codec over all 65,536 codes: the table / array decoders against the
+bit-level reference decoder, and the array encoder against encode_PgHalf,
+with NumPy and with the pure python fallback.
+"""
+import math
+import os
+import struct
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from package import ioUtils
+
+ALL_CODES = range(0x10000)
+# values around the range limits and the zero / subnormal handling, on top of every decoded code
+EXTRA_VALUES = [
+    -0.0, 1e-30, -1e-30, 1e-10, 65472.0, -65472.0, 65504.0, 1e5, -1e5, 3.4e38, 1e39, -1e39,
+    ioUtils.inf, ioUtils.ninf, ioUtils.nan
+]
+
+
+def _same(a: float, b: float) -> bool:
+    return (math.isnan(a) and math.isnan(b)) or a == b
+
+
+def _expected_code(value: float):
+    # encode_PgHalf then the uint16 check of write_PgHalf, None when writing it raises struct.error
+    try:
+        pghalf = ioUtils.encode_PgHalf(value)
+    except struct.error:
+        return None
+    return pghalf if 0 <= pghalf <= 0xffff else None
+
+
+class PgHalfCodecMixin:
+    def setUp(self):
+        self.saved_np = ioUtils.np
+        ioUtils.np = self.np
+        # the tables are built for the NumPy setting of the first use
+        ioUtils._PgHalf_table = None
+        ioUtils._PgHalf_nptable = None
+
+    def tearDown(self):
+        ioUtils.np = self.saved_np
+        ioUtils._PgHalf_table = None
+        ioUtils._PgHalf_nptable = None
+
+    def values(self) -> list:
+        return [ioUtils._decode_PgHalf_bits(pghalf) for pghalf in ALL_CODES] + EXTRA_VALUES
+
+    def test_decode(self):
+        for pghalf in ALL_CODES:
+            self.assertTrue(_same(ioUtils.decode_PgHalf(pghalf), ioUtils._decode_PgHalf_bits(pghalf)), hex(pghalf))
+
+    def test_decode_array(self):
+        decoded = list(ioUtils.decode_PgHalf_array(list(ALL_CODES)))
+        if self.np is not None:
+            decoded_np = ioUtils.decode_PgHalf_array(self.np.arange(0x10000, dtype=self.np.uint16)).tolist()
+            self.assertEqual(len(decoded_np), 0x10000)
+        for pghalf in ALL_CODES:
+            expected = ioUtils._decode_PgHalf_bits(pghalf)
+            self.assertTrue(_same(decoded[pghalf], expected), hex(pghalf))
+            if self.np is not None:
+                self.assertTrue(_same(decoded_np[pghalf], expected), hex(pghalf))
+
+    def test_encode_array(self):
+        values = self.values()
+        expected = [_expected_code(value) for value in values]
+        encodable = [value for value, pghalf in zip(values, expected) if pghalf is not None]
+        codes = [pghalf for pghalf in expected if pghalf is not None]
+
+        self.assertEqual(list(ioUtils.encode_PgHalf_array(encodable)), codes)
+        if self.np is not None:
+            self.assertEqual(ioUtils.encode_PgHalf_array(self.np.array(encodable)).tolist(), codes)
+
+        # every value writing would reject fails the array encoder too
+        for value, pghalf in zip(values, expected):
+            if pghalf is not None:
+                continue
+            with self.assertRaises(struct.error, msg=repr(value)):
+                ioUtils.encode_PgHalf_array([value])
+            if self.np is not None:
+                with self.assertRaises(struct.error, msg=repr(value)):
+                    ioUtils.encode_PgHalf_array(self.np.array([value]))
+
+
+class PgHalfCodecPythonTest(PgHalfCodecMixin, unittest.TestCase):
+    np = None
+
+
+@unittest.skipIf(ioUtils.np is None, "NumPy is not installed")
+class PgHalfCodecNumPyTest(PgHalfCodecMixin, unittest.TestCase):
+    np = ioUtils.np
+
+
+if __name__ == "__main__":
+    unittest.main()
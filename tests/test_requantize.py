@@ -0,0 +1,87 @@
+"""
+Requantization after task modifications: a no-op task leaves the file
+unchanged, + / - only move p and keep dp and every code, and channels a
+task never touches (the tangents) keep their header and codes.
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+import corpus
+from package import mot
+from package import task
+
+QUANTIZED_TYPES = (2, 3, 5, 6, 7, 8)
+
+
+def _synthetic_buffer(seed: int = 0) -> bytes:
+    return bytes(corpus.generate_mot(random.Random(seed), 90, 40, 240).toBuffer())
+
+
+def _apply(buffer: bytes, modifications: list[dict]) -> mot.MotFile:
+    mobj = mot.MotFile()
+    mobj.fromBuffer(buffer)
+    plan = task.TaskPlan([{
+        "conditions": [{"field": "interpolationType", "operator": ">=", "value": 1}],
+        "modifications": modifications
+    }])
+    with contextlib.redirect_stderr(io.StringIO()):
+        plan.applyFile(mobj)
+    return mobj
+
+
+def _codes(interpolation: mot.MotInterpolation) -> list[bytes]:
+    if isinstance(interpolation, mot.MotInterpolSplines):
+        return [column.tobytes() for column in interpolation.quantizedTrack.columns()]
+    return [interpolation.valuesQuantized.tobytes()]
+
+
+class RequantizeTest(unittest.TestCase):
+    def setUp(self):
+        self.buffer = _synthetic_buffer()
+        self.source = mot.MotFile()
+        self.source.fromBuffer(self.buffer)
+
+    def quantized(self, mobj: mot.MotFile):
+        for before, after in zip(self.source.records, mobj.records):
+            if before.interpolationType in QUANTIZED_TYPES:
+                yield before.interpolation, after.interpolation
+
+    def test_noop_task_is_byte_identical(self):
+        for modifications in ([{"operator": "+", "value": 0}], [{"operator": "*", "value": 1}]):
+            mobj = _apply(self.buffer, modifications)
+            self.assertEqual(bytes(mobj.toBuffer()), self.buffer, modifications)
+
+    def test_shift_keeps_codes(self):
+        for modifications in ([{"operator": "-", "value": 0.026782}], [{"operator": "+", "value": 0.5}]):
+            mobj = _apply(self.buffer, modifications)
+            offset = modifications[0]["value"] * (1 if modifications[0]["operator"] == "+" else -1)
+            for before, after in self.quantized(mobj):
+                self.assertEqual(_codes(after), _codes(before))
+                self.assertEqual(after.dp, before.dp)
+                # p is the shifted one, rounded to the header type
+                self.assertAlmostEqual(after.p, before.p + offset, delta=1e-3)
+
+    def test_untouched_tangents_keep_header_and_codes(self):
+        mobj = _apply(self.buffer, [{"operator": "*", "value": 1.01}, {"operator": "+", "value": 0.001}])
+        for before, after in self.quantized(mobj):
+            if not isinstance(before, mot.MotInterpolSplines):
+                continue
+            self.assertEqual(
+                (after.m0, after.dm0, after.m1, after.dm1), (before.m0, before.dm0, before.m1, before.dm1)
+            )
+            self.assertEqual(after.quantizedTrack.m0s.tobytes(), before.quantizedTrack.m0s.tobytes())
+            self.assertEqual(after.quantizedTrack.m1s.tobytes(), before.quantizedTrack.m1s.tobytes())
+            self.assertEqual(list(after.track.m0s), list(before.track.m0s))
+            self.assertEqual(list(after.track.m1s), list(before.track.m1s))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+"""
+Long-running worker for editor plugins and build scripts: the modules are
+imported and task files compiled once, requests are JSON lines read from
+stdin (or from a Unix socket with --socket) and the result of every file is
+streamed back as a JSON line while the request is processed.
+
+Request, the options of cli.py by their long name:
+    {"id": 1, "action": "apply_and_export", "files": ["a.mot"], "task": "task.json", "output": "out", "patch": true}
+Response, one line per file in input order, then a last line with "done":
+    {"id": 1, "file": "a.mot", "modified": true, "cached": false, "error": null, "output": "...", "log": "..."}
+    {"id": 1, "done": true, "processed": 1, "modified": 1, "cached": 0, "failed": 0}
+A request which cannot run is answered with {"id": 1, "done": true, "error": "..."}.
+"""
+import argparse
+import contextlib
+import json
+import os
+import signal
+import socketserver
+import stat
+import sys
+from typing import Callable
+
+import cli
+from package import task
+
+
+class TaskCache:
+    """Compiled task files by path, compiled again when the file changes"""
+    plans: dict[str, tuple[tuple[int, int], task.TaskPlan]]
+
+    def __init__(self):
+        self.plans = {}
+
+    def get(self, path: str) -> task.TaskPlan:
+        key = os.path.abspath(path)
+        st = os.stat(key)
+        stamp = (st.st_mtime_ns, st.st_size)
+        entry = self.plans.get(key)
+        if entry is None or entry[0] != stamp:
+            entry = (stamp, task.load(key))
+            self.plans[key] = entry
+        return entry[1]
+
+
+def _raise_usage(message: str):
+    raise UserWarning(message)
+
+
+def _request_argv(request: dict) -> list[str]:
+    argv = []
+    for key, value in request.items():
+        if key in ("id", "files") or value is None or value is False:
+            continue
+        option = "--" + key.replace("_", "-")
+        if value is True:
+            argv.append(option)
+        elif isinstance(value, list):
+            for v in value:
+                argv += [option, str(v)]
+        else:
+            argv += [option, str(value)]
+    files = request.get("files", [])
+    if isinstance(files, str):
+        files = [files]
+    return argv + ["--", *(str(f) for f in files)]
+
+
+class Worker:
+    parser: argparse.ArgumentParser
+    tasks: TaskCache
+
+    def __init__(self):
+        self.parser = cli.build_parser()
+        # a bad request is answered, not a reason to exit
+        self.parser.error = _raise_usage
+        self.tasks = TaskCache()
+
+    def handle(self, line: str, reply: Callable[[dict], None]):
+        request_id = None
+        counts = {"processed": 0, "modified": 0, "cached": 0, "failed": 0}
+
+        def on_result(result: cli.FileResult):
+            counts["processed"] += 1
+            if result.error is not None:
+                counts["failed"] += 1
+            elif result.cached:
+                counts["cached"] += 1
+            elif result.modified:
+                counts["modified"] += 1
+            reply({
+                "id": request_id,
+                "file": str(result.file),
+                "modified": bool(result.modified),
+                "cached": result.cached,
+                "error": result.error,
+                "output": result.output,
+                "log": result.log
+            })
+
+        # messages printed while a request runs (directory expansion, summary) go to stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise UserWarning("Request is not a JSON object")
+                request_id = request.get("id")
+                args = self.parser.parse_args(_request_argv(request))
+                files = cli.prepare_files(args)
+                if files is None:
+                    raise UserWarning("No valid file ...")
+                basepath = cli.prepare_output(args)
+                plan = None
+                if args.action in cli.action_task_required and args.task is not None:
+                    plan = self.tasks.get(args.task)
+                cli.main(args, files, basepath, plan, on_result)
+            except (Exception, SystemExit) as e:
+                reply({"id": request_id, "done": True, "error": f"{type(e).__name__}: {e}"})
+                return
+        reply({"id": request_id, "done": True, **counts})
+
+
+def serve_stdin(worker: Worker):
+    out = sys.stdout
+
+    def reply(obj: dict):
+        out.write(json.dumps(obj) + "\n")
+        out.flush()
+
+    for line in sys.stdin:
+        if line.strip():
+            worker.handle(line, reply)
+
+
+class _SocketHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        def reply(obj: dict):
+            self.wfile.write((json.dumps(obj) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+        for line in self.rfile:
+            if line.strip():
+                self.server.worker.handle(line.decode("utf-8"), reply)
+
+
+def serve_socket(worker: Worker, path: str):
+    if not hasattr(socketserver, "UnixStreamServer"):
+        raise UserWarning("Unix sockets are not supported on this platform, use stdin ...")
+    # a socket left over by an earlier run is replaced, anything else at path is kept
+    if os.path.lexists(path):
+        if not stat.S_ISSOCK(os.lstat(path).st_mode):
+            raise UserWarning(f"Argument \"socket\" targets an existing file which is not a socket ... {path}")
+        os.unlink(path)
+    # connections are served one after the other, requests share the process state
+    with socketserver.UnixStreamServer(path, _SocketHandler) as server:
+        server.worker = worker
+        # stopped by Ctrl+C or SIGTERM, the socket file is removed either way
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        print(f"> Listening on {path} ...", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--socket", "-s", help="Serve requests on this Unix socket instead of stdin / stdout", type=str)
+    args = parser.parse_args()
+
+    worker = Worker()
+    if args.socket is not None:
+        serve_socket(worker, args.socket)
+    else:
+        serve_stdin(worker)